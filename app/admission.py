@@ -0,0 +1,125 @@
+"""
+Admission control for the DB-backed API routes.
+
+Past capacity, extra requests only queue behind the thread pool and the
+connection pool and make every request slow. Each route class gets a gate
+instead: at most `concurrency` requests in flight, at most `queue_size` waiting
+(for up to ADMISSION_QUEUE_TIMEOUT seconds), and everything beyond that is
+answered at once with 503 + Retry-After (AdmissionControlMiddleware).
+
+  read    every API route that queries the catalogue or checks an API key
+  export  /medicamentos/export: holds a connection for the whole stream
+
+Not gated: admin (imports have their own lock), /medicamentos/snapshot (static
+files), and everything outside API_PREFIX (/health, /ready, docs, landing page).
+
+The defaults derive from DB_POOL_SIZE + DB_MAX_OVERFLOW: the gates admit as many
+requests as there are connections, and THREADPOOL_SIZE matches. That holds because
+a request uses one connection at a time: get_api_key commits (returning its
+connection) before the handler runs, and read sessions on the primary check theirs
+out on the first query. Ungated work on the same pool (admin, the scheduled refresh, index
+rebuilds) can still make an admitted request wait up to DB_POOL_TIMEOUT.
+check_capacity() warns at startup when explicit settings break the sizing.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from app.database import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds suggested to clients turned away by a full gate
+ADMISSION_RETRY_AFTER = 1
+# Under API_PREFIX: not gated
+UNGATED_PREFIXES = ("/admin", "/medicamentos/snapshot")
+
+
+class AdmissionGate:
+    """Bounded in-flight requests plus a bounded, time-limited wait queue (one event loop)"""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def acquire(self) -> bool:
+        """True when admitted (call release() afterwards); False when the request must be shed"""
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            self.in_flight += 1
+            return True
+        if self.waiting >= self.queue_size:
+            self.rejected += 1
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def status(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+def _gate(name: str, concurrency: int, queue_size: int) -> Optional[AdmissionGate]:
+    # A concurrency of 0 (or less) disables the gate
+    if concurrency <= 0:
+        return None
+    return AdmissionGate(name, concurrency, queue_size, settings.admission_queue_timeout)
+
+
+gates = {
+    "read": _gate("read", settings.admission_read_concurrency, settings.admission_queue_size),
+    "export": _gate("export", settings.admission_export_concurrency, settings.admission_export_concurrency * 2),
+}
+
+
+def route_gate(path: str) -> Optional[AdmissionGate]:
+    """The gate for a request path, or None when it is not gated"""
+    if not path.startswith(settings.api_prefix + "/"):
+        return None
+    path = path[len(settings.api_prefix):]
+    if path.startswith(UNGATED_PREFIXES):
+        return None
+    if path.startswith("/medicamentos/export"):
+        return gates["export"]
+    return gates["read"]
+
+
+def check_capacity() -> None:
+    """Warn when the admission limits, thread pool and DB pool sizes are inconsistent"""
+    connections = settings.db_pool_size + settings.db_max_overflow
+    admitted = sum(gate.concurrency for gate in gates.values() if gate is not None)
+    if admitted > connections:
+        logger.warning(
+            "Admission limits allow %d concurrent requests but the DB pool has %d connections "
+            "(DB_POOL_SIZE + DB_MAX_OVERFLOW): admitted requests may wait for a connection",
+            admitted, connections,
+        )
+    if settings.threadpool_size < admitted:
+        logger.warning(
+            "THREADPOOL_SIZE=%d is below the %d requests the admission limits allow: "
+            "admitted requests may wait for a thread",
+            settings.threadpool_size, admitted,
+        )
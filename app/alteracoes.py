@@ -0,0 +1,82 @@
+"""
+Change feed between dataset generations, for incremental client sync.
+
+Imports replace the whole table, so row ids say nothing across generations; the
+stable key is numero_registro_produto. After each load the importer hashes the
+exported fields of every registration (all of its rows), diffs the hashes
+against registros_versoes (the previous generation) and records one
+medicamento_alteracoes row per registration added, modified or removed.
+/medicamentos/changes pages through them by id. Rows without a registration
+number cannot be tracked and are left out.
+"""
+from sqlalchemy import Text, case, cast, func, insert, literal, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import Session
+
+from app.models import Medicamento, MedicamentoAlteracao, RegistroVersao
+from app.snapshots import EXPORT_FIELDS
+
+CHANGE_TYPES = ("added", "modified", "removed")
+# Hashed per row: the exported fields except the id, which changes on every import
+HASHED_FIELDS = [field for field in EXPORT_FIELDS if field != "id"]
+
+
+def _current_state():
+    """Registration number -> hash of its rows, for the loaded medicamentos"""
+    row_hash = func.md5(cast(tuple_(*(getattr(Medicamento, field) for field in HASHED_FIELDS)), Text))
+    return (
+        select(
+            Medicamento.numero_registro_produto.label("numero_registro_produto"),
+            func.md5(func.string_agg(row_hash, aggregate_order_by(literal_column("','"), row_hash)))
+            .label("conteudo_hash"),
+        )
+        .where(Medicamento.numero_registro_produto.isnot(None))
+        .group_by(Medicamento.numero_registro_produto)
+    )
+
+
+def record_changes(db: Session, generation_id: int) -> dict[str, int]:
+    """
+    Record the changes of `generation_id` against the previous generation and make
+    the loaded medicamentos the new baseline. Does not commit: the caller commits
+    the generation and its changes together, so the feed never announces a
+    generation whose changes are still being written.
+    """
+    current = _current_state().cte("current_state")
+    previous = RegistroVersao.__table__
+    numero = func.coalesce(current.c.numero_registro_produto, previous.c.numero_registro_produto)
+    tipo = case(
+        (previous.c.numero_registro_produto.is_(None), "added"),
+        (current.c.numero_registro_produto.is_(None), "removed"),
+        else_="modified",
+    )
+    changes = (
+        select(literal(generation_id), numero, tipo)
+        .select_from(
+            current.join(
+                previous, current.c.numero_registro_produto == previous.c.numero_registro_produto, full=True
+            )
+        )
+        .where(current.c.conteudo_hash.is_distinct_from(previous.c.conteudo_hash))
+        .order_by(numero)
+    )
+    db.execute(
+        insert(MedicamentoAlteracao).from_select(["generation_id", "numero_registro_produto", "tipo"], changes)
+    )
+
+    db.query(RegistroVersao).delete()
+    state = _current_state().subquery()
+    db.execute(
+        insert(RegistroVersao).from_select(
+            ["numero_registro_produto", "conteudo_hash", "generation_id"],
+            select(state.c.numero_registro_produto, state.c.conteudo_hash, literal(generation_id)),
+        )
+    )
+
+    counts = dict(
+        db.query(MedicamentoAlteracao.tipo, func.count())
+        .filter(MedicamentoAlteracao.generation_id == generation_id)
+        .group_by(MedicamentoAlteracao.tipo)
+        .all()
+    )
+    return {tipo: counts.get(tipo, 0) for tipo in CHANGE_TYPES}
@@ -1,9 +1,13 @@
-from fastapi import Security, HTTPException, status, Depends
+from fastapi import Security, HTTPException, status, Depends, Request
 from fastapi.security import APIKeyHeader
+from sqlalchemy import inspect
 from sqlalchemy.orm import Session
 import hashlib
+from typing import Optional
 from app.database import get_db
 from app.models import APIKey
+from app.quotas import enforce_quota
+from app.timing import timing_span
 from datetime import datetime
 
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
@@ -14,33 +18,49 @@ def hash_key(key: str) -> str:
     return hashlib.sha256(key.encode()).hexdigest()
 
 
-def verify_api_key(api_key: str, db: Session) -> bool:
-    """Verify if API key exists and is active"""
+def authenticate_api_key(api_key: str, db: Session) -> Optional[APIKey]:
+    """Return the active APIKey matching the plain key, or None"""
     hashed_key = hash_key(api_key)
     db_key = db.query(APIKey).filter(APIKey.key == hashed_key).first()
     if not db_key or not db_key.is_active:
-        return False
+        return None
     
     # Update last_used_at
     db_key.last_used_at = datetime.utcnow()
     db.commit()
-    return True
+    return db_key
+
+
+def verify_api_key(api_key: str, db: Session) -> bool:
+    """Verify if API key exists and is active"""
+    return authenticate_api_key(api_key, db) is not None
 
 
-def get_api_key(api_key: str = Security(api_key_header), db: Session = Depends(get_db)):
-    """Dependency to validate API key"""
+def get_api_key(
+    request: Request,
+    api_key: str = Security(api_key_header),
+    db: Session = Depends(get_db),
+):
+    """Dependency to validate API key and enforce its rate limit and daily quota"""
     if not api_key:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="API Key missing"
         )
     
-    if not verify_api_key(api_key, db):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or inactive API Key"
-        )
-    
+    with timing_span("auth"):
+        db_key = authenticate_api_key(api_key, db)
+        if not db_key:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid or inactive API Key"
+            )
+        # Primary key from the identity map: reading db_key.id after the commit would reload the row
+        key_id = inspect(db_key).identity[0]
+        # Added to the response by RequestContextMiddleware, including routes that return a Response
+        request.state.quota_headers = enforce_quota(key_id, db)
+        # Hand the connection back to the pool before the handler runs (it may need one of its own)
+        db.commit()
     return api_key
 
 
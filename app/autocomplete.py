@@ -0,0 +1,146 @@
+"""
+In-memory prefix index for /medicamentos/autocomplete: distinct product names
+and active ingredients, ranked by how many medicamentos carry them.
+
+Keys are the normalized names (app.text.normalize_search_text) in a sorted list,
+so a prefix is a contiguous range found with two binary searches. The top
+results of every prefix up to PRECOMPUTED_PREFIX_LENGTH characters (the widest
+ranges, i.e. the first keystrokes) are computed at build time. The index is
+immutable and tied to a dataset generation; a new one replaces it after an import.
+"""
+import bisect
+import heapq
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import NamedTuple, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import new_read_session, settings
+from app.models import DatasetGeneration, Medicamento, PrincipioAtivo
+
+logger = logging.getLogger(__name__)
+
+MAX_SUGGESTIONS = 20
+PRECOMPUTED_PREFIX_LENGTH = 3
+# Above every character a normalized key can contain: prefix + _KEY_END bounds the prefix range
+_KEY_END = "\uffff"
+
+
+class Suggestion(NamedTuple):
+    nome: str
+    tipo: str  # "produto" or "substancia"
+    total_medicamentos: int
+
+
+class PrefixIndex:
+    """Immutable sorted-array prefix index with precomputed top-k for short prefixes"""
+
+    def __init__(self, entries: list[tuple[str, Suggestion]], generation: Optional[int]):
+        entries.sort(key=lambda entry: (entry[0], entry[1].tipo))
+        self.generation = generation
+        self.keys = [key for key, _ in entries]
+        self.suggestions = [suggestion for _, suggestion in entries]
+        self._top: dict[str, tuple[int, ...]] = {}
+
+        buckets = defaultdict(list)
+        for i, key in enumerate(self.keys):
+            for length in range(1, min(len(key), PRECOMPUTED_PREFIX_LENGTH) + 1):
+                buckets[key[:length]].append(i)
+        for prefix, positions in buckets.items():
+            self._top[prefix] = tuple(heapq.nlargest(MAX_SUGGESTIONS, positions, key=self._rank))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _rank(self, i: int) -> tuple[int, int]:
+        # Most medicamentos first; ties in alphabetical order (lower position)
+        return self.suggestions[i].total_medicamentos, -i
+
+    def search(self, prefix: str, limit: int = 10) -> list[Suggestion]:
+        """Top `limit` suggestions whose normalized key starts with `prefix` (already normalized)"""
+        positions = self._top.get(prefix)
+        if positions is None and len(prefix) > PRECOMPUTED_PREFIX_LENGTH:
+            low = bisect.bisect_left(self.keys, prefix)
+            high = bisect.bisect_left(self.keys, prefix + _KEY_END, low)
+            positions = heapq.nlargest(limit, range(low, high), key=self._rank)
+        return [self.suggestions[i] for i in (positions or ())[:limit]]
+
+
+def current_generation(db: Session) -> Optional[int]:
+    return db.query(func.max(DatasetGeneration.id)).scalar()
+
+
+def build_index(db: Session, generation: Optional[int]) -> PrefixIndex:
+    """Distinct product names (with their product counts) and active ingredients"""
+    entries = []
+    produtos = (
+        db.query(Medicamento.nome_produto_busca, func.min(Medicamento.nome_produto), func.count())
+        .filter(Medicamento.nome_produto_busca.isnot(None))
+        .group_by(Medicamento.nome_produto_busca)
+    )
+    for key, nome, total in produtos:
+        entries.append((key, Suggestion(nome, "produto", total)))
+    substancias = db.query(PrincipioAtivo.nome_busca, PrincipioAtivo.nome, PrincipioAtivo.total_medicamentos)
+    for key, nome, total in substancias:
+        entries.append((key, Suggestion(nome, "substancia", total)))
+    return PrefixIndex(entries, generation)
+
+
+class Autocomplete:
+    """
+    Holds the current PrefixIndex. At most one generation check every
+    `check_interval` seconds; when the generation changed, one thread rebuilds
+    while the others keep answering from the previous index. An announced
+    generation (invalidate) always rebuilds, even when a periodic check already
+    built an index for that generation id.
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self.index: Optional[PrefixIndex] = None
+        self._checked_at = time.monotonic() - self.check_interval
+        self._rebuild = False
+        self._lock = threading.Lock()
+
+    def get_index(self) -> PrefixIndex:
+        index = self.index
+        if index is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return index
+        # Nothing to serve yet: wait for the first build instead of answering empty
+        if not self._lock.acquire(blocking=index is None):
+            return index
+        try:
+            if self.index is None or time.monotonic() - self._checked_at >= self.check_interval:
+                self.refresh(force=self._rebuild)
+        finally:
+            self._lock.release()
+        return self.index
+
+    def invalidate(self) -> None:
+        """Rebuild on the next request (a new generation was announced)"""
+        self._rebuild = True
+        self._checked_at = time.monotonic() - self.check_interval
+
+    def refresh(self, force: bool = False) -> None:
+        db = new_read_session()
+        try:
+            generation = current_generation(db)
+            if force or self.index is None or generation != self.index.generation:
+                # Cleared before the build: an announcement arriving meanwhile triggers another one
+                self._rebuild = False
+                started = time.perf_counter()
+                self.index = build_index(db, generation)
+                logger.info(
+                    "Autocomplete index built: %d entries, generation %s, %.0fms",
+                    len(self.index), generation, (time.perf_counter() - started) * 1000,
+                )
+            self._checked_at = time.monotonic()
+        finally:
+            db.close()
+
+
+autocomplete = Autocomplete(settings.autocomplete_check_interval)
@@ -0,0 +1,66 @@
+"""
+Company dimension: the registration holder arrives as "CNPJ - RAZÃO SOCIAL" in
+empresa_detentora_registro. The importer parses it into empresas (keyed by the
+14-digit CNPJ) and points each medicamento at it through empresa_cnpj, so
+"every product of a company" is an indexed lookup instead of a text scan.
+"""
+import re
+from typing import Iterable, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import Empresa, Medicamento
+from app.text import normalize_search_text
+
+# "61190096000192 - EUROFARMA LABORATORIOS S.A." (punctuated CNPJs are accepted too)
+EMPRESA_RE = re.compile(r"^\s*(\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2})\s*-\s*(.+?)\s*$")
+_NON_DIGITS_RE = re.compile(r"\D")
+
+
+def parse_empresa(value: Optional[str]) -> Optional[tuple[str, str]]:
+    """(cnpj, razao_social) from "CNPJ - RAZÃO SOCIAL", or None when the value has no CNPJ"""
+    if not value:
+        return None
+    match = EMPRESA_RE.match(value)
+    if not match:
+        return None
+    return _NON_DIGITS_RE.sub("", match.group(1)), match.group(2)
+
+
+def empresa_row(cnpj: str, razao_social: str) -> dict:
+    return {"cnpj": cnpj, "razao_social": razao_social, "razao_social_busca": normalize_search_text(razao_social)}
+
+
+def upsert_empresas(db: Session, rows: Iterable[dict]) -> None:
+    """Insert or rename companies (rows from empresa_row); the last name seen for a CNPJ wins"""
+    by_cnpj = {row["cnpj"]: row for row in rows}
+    if not by_cnpj:
+        return
+    stmt = insert(Empresa.__table__).values(list(by_cnpj.values()))
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[Empresa.cnpj],
+        set_={"razao_social": stmt.excluded.razao_social, "razao_social_busca": stmt.excluded.razao_social_busca},
+        where=Empresa.razao_social != stmt.excluded.razao_social,
+    ))
+
+
+def ensure_empresas(db: Session, medicamentos: list[Medicamento]) -> None:
+    """Create the companies a batch of medicamentos (built by the importer) references, before inserting it"""
+    upsert_empresas(db, (
+        empresa_row(*parsed)
+        for parsed in (parse_empresa(m.empresa_detentora_registro) for m in medicamentos if m.empresa_cnpj)
+        if parsed
+    ))
+
+
+def refresh_empresa_counts(db: Session) -> None:
+    """Recompute Empresa.total_medicamentos after an import (does not commit)"""
+    counts = (
+        select(func.count())
+        .select_from(Medicamento)
+        .where(Medicamento.empresa_cnpj == Empresa.cnpj)
+        .scalar_subquery()
+    )
+    db.execute(update(Empresa).values(total_medicamentos=counts))
@@ -0,0 +1,58 @@
+"""
+Equivalence groups: medicamentos whose active-ingredient sets (from
+medicamento_principios) are identical, so "other registered products with the
+same active ingredients" is one indexed lookup on grupo_equivalencia_id instead
+of a wildcard principio_ativo search. Built by the importer after the substances.
+"""
+from sqlalchemy import func, literal_column, select, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from sqlalchemy.orm import Session
+
+from app.models import GrupoEquivalencia, Medicamento, PrincipioAtivo, medicamento_principios
+
+KEY_SEPARATOR = " + "
+
+
+def build_grupos_equivalencia(db: Session) -> int:
+    """
+    Assign every medicamento with active ingredients to the group of its ingredient
+    set, creating missing groups (existing ids are kept), and refresh the group
+    counts. Returns the number of groups in use. Does not commit (see build_substancias).
+    """
+    separator = literal_column(f"'{KEY_SEPARATOR}'")
+    ingredient_sets = (
+        select(
+            medicamento_principios.c.medicamento_id,
+            func.string_agg(PrincipioAtivo.nome_busca, aggregate_order_by(separator, PrincipioAtivo.nome_busca))
+            .label("chave"),
+            func.string_agg(PrincipioAtivo.nome, aggregate_order_by(separator, PrincipioAtivo.nome_busca))
+            .label("nome"),
+        )
+        .join(PrincipioAtivo, PrincipioAtivo.id == medicamento_principios.c.principio_ativo_id)
+        .group_by(medicamento_principios.c.medicamento_id)
+        .cte("ingredient_sets")
+    )
+
+    table = GrupoEquivalencia.__table__
+    new_groups = select(ingredient_sets.c.chave, func.min(ingredient_sets.c.nome)).group_by(ingredient_sets.c.chave)
+    db.execute(
+        insert(table)
+        .from_select(["chave", "nome"], new_groups)
+        .on_conflict_do_nothing(index_elements=[table.c.chave])
+    )
+    db.execute(update(Medicamento).where(Medicamento.grupo_equivalencia_id.isnot(None)).values(grupo_equivalencia_id=None))
+    db.execute(
+        update(Medicamento)
+        .where(Medicamento.id == ingredient_sets.c.medicamento_id, GrupoEquivalencia.chave == ingredient_sets.c.chave)
+        .values(grupo_equivalencia_id=GrupoEquivalencia.id)
+    )
+
+    counts = (
+        select(func.count())
+        .select_from(Medicamento)
+        .where(Medicamento.grupo_equivalencia_id == GrupoEquivalencia.id)
+        .scalar_subquery()
+    )
+    db.execute(update(GrupoEquivalencia).values(total_medicamentos=counts))
+    in_use = db.query(func.count()).select_from(GrupoEquivalencia).filter(GrupoEquivalencia.total_medicamentos > 0)
+    return in_use.scalar()
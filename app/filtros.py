@@ -0,0 +1,77 @@
+"""
+Exact-match filters for the low-cardinality columns (situacao, categoria_regulatoria).
+
+The importer records the distinct values of each column in valores_filtro. A
+request value is resolved against that list, ignoring case and accents, either
+as the whole stored value or as one of its "/" parts (VALIDO -> VÁLIDO,
+CADUCO -> CADUCO/CANCELADO). The stored values are then matched with IN on the
+B-tree indexed column, not with a pattern scan. Unknown values are a 400 that
+lists the allowed ones.
+"""
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models import Medicamento, ValorFiltro
+from app.text import normalize_search_text
+
+# Query parameter -> column
+FILTER_COLUMNS = {
+    "situacao": Medicamento.situacao_registro,
+    "categoria_regulatoria": Medicamento.categoria_regulatoria,
+}
+
+
+def filter_keys(valor: str) -> set[str]:
+    """Normalized spellings that select `valor`: the whole value and each of its "/" parts"""
+    keys = {normalize_search_text(valor)}
+    keys.update(normalize_search_text(part) for part in valor.split("/"))
+    keys.discard("")
+    return keys
+
+
+def build_valores_filtro(db: Session) -> int:
+    """Rebuild valores_filtro from the loaded medicamentos. Returns the number of values. Does not commit."""
+    db.query(ValorFiltro).delete()
+    rows = []
+    for campo, column in FILTER_COLUMNS.items():
+        counts = db.query(column, func.count()).filter(column.isnot(None)).group_by(column).all()
+        rows.extend({"campo": campo, "valor": valor, "total_medicamentos": total} for valor, total in counts)
+    if rows:
+        db.execute(ValorFiltro.__table__.insert(), rows)
+    return len(rows)
+
+
+def allowed_values(db: Session, campo: str) -> list[str]:
+    """Stored values of a filter column, most common first"""
+    valores = [
+        valor for valor, in db.query(ValorFiltro.valor)
+        .filter(ValorFiltro.campo == campo)
+        .order_by(ValorFiltro.total_medicamentos.desc(), ValorFiltro.valor)
+    ]
+    if not valores:
+        # Not imported since the valores_filtro migration: read the column itself
+        column = FILTER_COLUMNS[campo]
+        valores = [valor for valor, in db.query(column).filter(column.isnot(None)).distinct().order_by(column)]
+    return valores
+
+
+def resolve_filter_values(db: Session, campo: str, values: Optional[list[str]]) -> list[str]:
+    """The stored values selected by the request `values` of filter `campo` (400 on unknown values)"""
+    wanted = [value for value in values or [] if value.strip()]
+    if not wanted:
+        return []
+    valores = allowed_values(db, campo)
+    resolved = []
+    for value in wanted:
+        key = normalize_search_text(value)
+        matches = [valor for valor in valores if key in filter_keys(valor)]
+        if not matches:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown {campo} value '{value}'. Allowed values: {', '.join(valores)}"
+            )
+        resolved.extend(valor for valor in matches if valor not in resolved)
+    return resolved
@@ -0,0 +1,97 @@
+"""
+New-dataset-generation notifications between workers.
+
+The import ends with NOTIFY dataset_generation, '<id>' (notify_new_generation),
+after every derived artifact (substances, counts, snapshots) is in place. Each API
+worker keeps one LISTEN connection (GenerationListener) and runs the subscribed
+callbacks, so in-memory caches are refreshed right away instead of on their next
+periodic check. Notifications are best effort: the periodic checks stay as the
+fallback for a missed one (e.g. while the listener reconnects).
+"""
+import logging
+import select
+import threading
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+GENERATION_CHANNEL = "dataset_generation"
+# Seconds between checks of the stop flag while waiting for notifications
+LISTEN_POLL_SECONDS = 5.0
+RECONNECT_DELAY_SECONDS = 5.0
+
+
+def notify_new_generation(engine: Engine, generation_id: int) -> None:
+    """Tell every listening worker that `generation_id` is ready"""
+    with engine.begin() as conn:
+        conn.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": GENERATION_CHANNEL, "payload": str(generation_id)},
+        )
+
+
+class GenerationListener:
+    """Background thread with a dedicated LISTEN connection (outside the pool)"""
+
+    def __init__(self):
+        self._callbacks: list[Callable[[int], None]] = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback: Callable[[int], None]) -> None:
+        self._callbacks.append(callback)
+
+    def start(self, engine: Engine) -> None:
+        if engine.dialect.name != "postgresql" or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(engine,), name="generation-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=LISTEN_POLL_SECONDS + 1)
+            self._thread = None
+
+    def _dispatch(self, generation: int) -> None:
+        logger.info("Dataset generation %s announced", generation)
+        for callback in self._callbacks:
+            try:
+                callback(generation)
+            except Exception:
+                logger.exception("Generation callback %r failed", callback)
+
+    def _listen(self, engine: Engine) -> None:
+        pooled = engine.raw_connection()
+        # Not returned to the pool: this connection lives as long as the listener
+        pooled.detach()
+        conn = pooled.dbapi_connection
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {GENERATION_CHANNEL}")
+            while not self._stop.is_set():
+                if not select.select([conn], [], [], LISTEN_POLL_SECONDS)[0]:
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    if notify.payload.isdigit():
+                        self._dispatch(int(notify.payload))
+        finally:
+            conn.close()
+
+    def _run(self, engine: Engine) -> None:
+        while not self._stop.is_set():
+            try:
+                self._listen(engine)
+            except Exception as e:
+                logger.warning("Generation listener disconnected, retrying in %.0fs: %s", RECONNECT_DELAY_SECONDS, e)
+                self._stop.wait(RECONNECT_DELAY_SECONDS)
+
+
+generation_listener = GenerationListener()
@@ -1,21 +1,44 @@
 from contextlib import asynccontextmanager
 from pathlib import Path
+import anyio.to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
-from app.database import init_db, settings
-from app.routes import medicamentos, auth, stats, admin
+from sqlalchemy.exc import OperationalError
+from app.admission import check_capacity
+from app.autocomplete import autocomplete
+from app.database import engine, read_engine, settings
+from app.generations import generation_listener
+from app.migrations import verify_schema
+from app.middleware import AdmissionControlMiddleware, RequestContextMiddleware
+from app.profiling import install_query_hooks, install_route_profiling
+from app.query_guards import statement_timeout_handler
+from app.routes import medicamentos, auth, stats, admin, substancias, empresas
+from app.scheduler import refresh_scheduler
+from app.sqlite_backend import sqlite_snapshot
+from app.warmup import readiness
 
 STATIC_DIR = Path(__file__).parent / "static"
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
-    init_db()
+    # Startup: schema changes are applied by scripts/migrate.py, only check the version here
+    verify_schema(engine)
+    # Threads for sync handlers and dependencies, sized with the DB pool (see app.admission)
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_size
+    check_capacity()
+    # New generations announced by the importer refresh the in-memory caches right away
+    generation_listener.subscribe(lambda generation: autocomplete.invalidate())
+    if settings.read_backend == "sqlite":
+        generation_listener.subscribe(lambda generation: sqlite_snapshot.invalidate())
+    generation_listener.start(engine)
+    refresh_scheduler.start()
+    readiness.start(settings.warmup_on_startup)
     yield
-    # Shutdown (if needed)
+    await refresh_scheduler.stop()
+    generation_listener.stop()
 
 
 app = FastAPI(
@@ -27,27 +50,35 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# Ensure UTF-8 encoding for JSON responses
-@app.middleware("http")
-async def ensure_utf8_middleware(request, call_next):
-    response = await call_next(request)
-    if response.headers.get("content-type", "").startswith("application/json"):
-        response.headers["content-type"] = "application/json; charset=utf-8"
-    return response
-
+# Innermost: load shedding per route class, behind CORS so 503s carry CORS headers
+app.add_middleware(AdmissionControlMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-Process-Time", "Server-Timing"],
 )
+# Outermost: UTF-8 JSON content type, request id and timing (pure ASGI, no body buffering)
+app.add_middleware(RequestContextMiddleware)
+
+# Statement timeouts on read sessions -> 503 + Retry-After
+app.add_exception_handler(OperationalError, statement_timeout_handler)
 
 app.include_router(medicamentos.router, prefix=settings.api_prefix)
 app.include_router(auth.router, prefix=settings.api_prefix)
 app.include_router(stats.router, prefix=settings.api_prefix)
+app.include_router(substancias.router, prefix=settings.api_prefix)
+app.include_router(empresas.router, prefix=settings.api_prefix)
 app.include_router(admin.router, prefix=settings.api_prefix)
 
+# Slow-query log on both pools; /admin/profile can profile any API route
+install_query_hooks(engine)
+if read_engine is not None:
+    install_query_hooks(read_engine)
+install_route_profiling(app)
+
 if STATIC_DIR.exists():
     app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
@@ -67,4 +98,13 @@ def root():
 
 @app.get("/health")
 def health():
+    """Liveness: the process is up"""
     return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready():
+    """Readiness: 503 until this worker has warmed up (point load balancer health checks here)"""
+    if not readiness.ready:
+        return JSONResponse(status_code=503, content=readiness.status(), headers={"Retry-After": "1"})
+    return readiness.status()
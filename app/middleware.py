@@ -0,0 +1,121 @@
+"""
+Pure ASGI middleware. Unlike @app.middleware("http") (BaseHTTPMiddleware) these
+wrap `send` directly: no extra task or memory stream per request, and streaming
+responses pass through without being buffered.
+"""
+import logging
+import random
+import time
+import uuid
+
+from fastapi.responses import JSONResponse
+
+from app.admission import ADMISSION_RETRY_AFTER, route_gate
+from app.database import settings
+from app.timing import collect_request_timings
+
+logger = logging.getLogger("app.requests")
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+
+def _valid_request_id(value: bytes) -> bool:
+    return 0 < len(value) <= 128 and all(33 <= c < 127 for c in value)
+
+
+class RequestContextMiddleware:
+    """
+    - forces `charset=utf-8` on JSON responses
+    - propagates the client's X-Request-ID or generates one
+    - adds X-Process-Time (ms until the response headers) and logs total time
+    - adds the X-RateLimit-* headers get_api_key left in the request state, so
+      routes returning their own Response (export, snapshot) carry them too
+    - for a SERVER_TIMING_SAMPLE_RATE share of requests, adds a Server-Timing
+      breakdown (app.timing)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER and _valid_request_id(value):
+                request_id = value
+                break
+        if request_id is None:
+            request_id = uuid.uuid4().hex.encode()
+        state = scope.setdefault("state", {})
+        state["request_id"] = request_id.decode()
+        status_code = None
+        timings = None
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = []
+                for name, value in message.get("headers", []):
+                    if name == b"content-type" and value.startswith(b"application/json"):
+                        value = b"application/json; charset=utf-8"
+                    headers.append((name, value))
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                headers.append((REQUEST_ID_HEADER, request_id))
+                for name, value in state.get("quota_headers", {}).items():
+                    headers.append((name.lower().encode(), value.encode()))
+                headers.append((b"x-process-time", f"{elapsed_ms:.2f}".encode()))
+                if timings is not None:
+                    headers.append((b"server-timing", timings.header(elapsed_ms).encode()))
+                    headers.append((b"timing-allow-origin", b"*"))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                logger.info(
+                    "%s %s %s %.2fms request_id=%s",
+                    scope["method"],
+                    scope["path"],
+                    status_code,
+                    (time.perf_counter() - started) * 1000,
+                    request_id.decode(),
+                )
+            await send(message)
+
+        rate = settings.server_timing_sample_rate
+        if rate <= 0 or (rate < 1 and random.random() >= rate):
+            await self.app(scope, receive, send_wrapper)
+            return
+        with collect_request_timings() as timings:
+            await self.app(scope, receive, send_wrapper)
+
+
+class AdmissionControlMiddleware:
+    """
+    Sheds load per route class (app.admission): a request waits for a slot in its
+    gate or gets 503 + Retry-After right away. The slot is held until the response
+    has been sent, streaming bodies included.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        gate = route_gate(scope["path"]) if scope["type"] == "http" else None
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+        if not await gate.acquire():
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server busy, try again shortly"},
+                headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
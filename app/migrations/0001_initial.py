@@ -0,0 +1,56 @@
+"""Initial schema (adopts databases created by the old create_all at startup)."""
+
+
+def upgrade(conn):
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS medicamentos (
+            id SERIAL PRIMARY KEY,
+            tipo_produto VARCHAR(100),
+            nome_produto VARCHAR(500),
+            data_finalizacao_processo DATE,
+            categoria_regulatoria VARCHAR(100),
+            numero_registro_produto VARCHAR(50),
+            data_vencimento_registro DATE,
+            numero_processo VARCHAR(100),
+            classe_terapeutica VARCHAR(500),
+            empresa_detentora_registro TEXT,
+            situacao_registro VARCHAR(100),
+            principio_ativo TEXT,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+            updated_at TIMESTAMP WITH TIME ZONE
+        )
+    """)
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_medicamentos_id ON medicamentos (id)")
+
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS api_keys (
+            id SERIAL PRIMARY KEY,
+            key VARCHAR(255) NOT NULL,
+            name VARCHAR(200) NOT NULL,
+            is_active BOOLEAN NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+            last_used_at TIMESTAMP WITH TIME ZONE
+        )
+    """)
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_api_keys_id ON api_keys (id)")
+    conn.exec_driver_sql("CREATE UNIQUE INDEX IF NOT EXISTS ix_api_keys_key ON api_keys (key)")
+
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS api_key_usage (
+            api_key_id INTEGER NOT NULL REFERENCES api_keys (id) ON DELETE CASCADE,
+            period VARCHAR(10) NOT NULL,
+            window_start TIMESTAMP WITH TIME ZONE NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (api_key_id, period)
+        )
+    """)
+
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS dataset_generations (
+            id SERIAL PRIMARY KEY,
+            source TEXT,
+            row_count INTEGER NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        )
+    """)
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_dataset_generations_id ON dataset_generations (id)")
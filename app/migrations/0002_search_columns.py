@@ -0,0 +1,64 @@
+"""
+Accent- and case-folded search columns on medicamentos, backfilled in batches,
+with trigram GIN indexes (LIKE '%term%' can use them). Falls back to
+text_pattern_ops B-tree indexes (prefix matches only) when pg_trgm is unavailable.
+"""
+from sqlalchemy import text
+
+from app.migrations import create_index_concurrently
+from app.text import normalize_search_text
+
+transactional = False
+BACKFILL_BATCH_SIZE = 5000
+COLUMNS = {
+    "nome_produto": "VARCHAR(500)",
+    "principio_ativo": "TEXT",
+    "classe_terapeutica": "VARCHAR(500)",
+}
+
+
+def _enable_trigram(conn) -> bool:
+    try:
+        conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except Exception as e:
+        print(f"Warning: pg_trgm unavailable ({e.__class__.__name__}); using B-tree prefix indexes")
+        return False
+    return True
+
+
+def upgrade(conn):
+    for column, column_type in COLUMNS.items():
+        conn.exec_driver_sql(f"ALTER TABLE medicamentos ADD COLUMN IF NOT EXISTS {column}_busca {column_type}")
+
+    # Backfill in short autocommitted batches (resumable: only rows with a column not yet filled)
+    unfilled = " OR ".join(f"({column}_busca IS NULL AND {column} IS NOT NULL)" for column in COLUMNS)
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, nome_produto, principio_ativo, classe_terapeutica FROM medicamentos "
+            f"WHERE id > :last_id AND ({unfilled}) "
+            "ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": BACKFILL_BATCH_SIZE}).all()
+        if not rows:
+            break
+        conn.execute(text(
+            "UPDATE medicamentos SET nome_produto_busca = :nome, principio_ativo_busca = :principio, "
+            "classe_terapeutica_busca = :classe WHERE id = :id"
+        ), [
+            {
+                "id": row.id,
+                "nome": normalize_search_text(row.nome_produto),
+                "principio": normalize_search_text(row.principio_ativo),
+                "classe": normalize_search_text(row.classe_terapeutica),
+            }
+            for row in rows
+        ])
+        last_id = rows[-1].id
+
+    trigram = _enable_trigram(conn)
+    for column in COLUMNS:
+        name = f"ix_medicamentos_{column}_busca"
+        if trigram:
+            create_index_concurrently(conn, name, "medicamentos", f"{column}_busca gin_trgm_ops", using="gin")
+        else:
+            create_index_concurrently(conn, name, "medicamentos", f"{column}_busca text_pattern_ops")
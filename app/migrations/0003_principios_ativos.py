@@ -0,0 +1,35 @@
+"""
+Active-ingredient dimension (principios_ativos) and the medicamento_principios
+link table. Populated by the next run of scripts/import_csv.py.
+"""
+from app.migrations import create_index_concurrently
+
+transactional = False
+
+
+def upgrade(conn):
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS principios_ativos (
+            id SERIAL PRIMARY KEY,
+            nome VARCHAR(500) NOT NULL,
+            nome_busca VARCHAR(500) NOT NULL UNIQUE,
+            total_medicamentos INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS medicamento_principios (
+            medicamento_id INTEGER NOT NULL REFERENCES medicamentos (id) ON DELETE CASCADE,
+            principio_ativo_id INTEGER NOT NULL REFERENCES principios_ativos (id) ON DELETE CASCADE,
+            PRIMARY KEY (medicamento_id, principio_ativo_id)
+        )
+    """)
+    create_index_concurrently(conn, "ix_principios_ativos_id", "principios_ativos", "id")
+    # Substance -> products lookups, already ordered by medicamento id
+    create_index_concurrently(
+        conn, "ix_medicamento_principios_principio", "medicamento_principios", "principio_ativo_id, medicamento_id"
+    )
+    # Prefix filter on the substance list (LIKE 'term%')
+    create_index_concurrently(
+        conn, "ix_principios_ativos_nome_busca_prefix", "principios_ativos", "nome_busca text_pattern_ops"
+    )
+    print("Note: principios_ativos is filled by the next import (python scripts/import_csv.py).")
@@ -0,0 +1,59 @@
+"""
+Company dimension (empresas, keyed by CNPJ) and medicamentos.empresa_cnpj,
+backfilled from the distinct empresa_detentora_registro values already loaded.
+"""
+from sqlalchemy import text
+
+from app.empresas import empresa_row, parse_empresa
+from app.migrations import create_index_concurrently
+
+transactional = False
+
+
+def upgrade(conn):
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS empresas (
+            cnpj VARCHAR(14) PRIMARY KEY,
+            razao_social VARCHAR(500) NOT NULL,
+            razao_social_busca VARCHAR(500),
+            total_medicamentos INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.exec_driver_sql(
+        "ALTER TABLE medicamentos ADD COLUMN IF NOT EXISTS empresa_cnpj VARCHAR(14) REFERENCES empresas (cnpj)"
+    )
+
+    # A few thousand distinct values: parse them here, then one join UPDATE
+    values = conn.exec_driver_sql(
+        "SELECT DISTINCT empresa_detentora_registro FROM medicamentos "
+        "WHERE empresa_detentora_registro IS NOT NULL AND empresa_cnpj IS NULL"
+    ).scalars().all()
+    parsed = {value: parse_empresa(value) for value in values}
+    parsed = {value: empresa for value, empresa in parsed.items() if empresa}
+    if parsed:
+        empresas = {cnpj: empresa_row(cnpj, razao_social) for cnpj, razao_social in parsed.values()}
+        conn.execute(text(
+            "INSERT INTO empresas (cnpj, razao_social, razao_social_busca) "
+            "VALUES (:cnpj, :razao_social, :razao_social_busca) ON CONFLICT (cnpj) DO NOTHING"
+        ), list(empresas.values()))
+        conn.exec_driver_sql("CREATE TEMPORARY TABLE empresa_backfill (valor TEXT PRIMARY KEY, cnpj VARCHAR(14))")
+        conn.execute(text("INSERT INTO empresa_backfill (valor, cnpj) VALUES (:valor, :cnpj)"), [
+            {"valor": value, "cnpj": cnpj} for value, (cnpj, _) in parsed.items()
+        ])
+        conn.exec_driver_sql(
+            "UPDATE medicamentos m SET empresa_cnpj = b.cnpj FROM empresa_backfill b "
+            "WHERE m.empresa_detentora_registro = b.valor AND m.empresa_cnpj IS NULL"
+        )
+        conn.exec_driver_sql("DROP TABLE empresa_backfill")
+
+    # Company -> products lookups, already ordered by id
+    create_index_concurrently(conn, "ix_medicamentos_empresa_cnpj", "medicamentos", "empresa_cnpj, id")
+    # Prefix filter on the company list (LIKE 'term%')
+    create_index_concurrently(
+        conn, "ix_empresas_razao_social_busca_prefix", "empresas", "razao_social_busca text_pattern_ops"
+    )
+    conn.exec_driver_sql("""
+        UPDATE empresas e SET total_medicamentos = (
+            SELECT count(*) FROM medicamentos m WHERE m.empresa_cnpj = e.cnpj
+        )
+    """)
@@ -0,0 +1,16 @@
+"""
+B-tree indexes for the registration expiry and process finalization date
+filters (and /medicamentos/vencendo, ordered by expiry).
+"""
+from app.migrations import create_index_concurrently
+
+transactional = False
+
+
+def upgrade(conn):
+    create_index_concurrently(
+        conn, "ix_medicamentos_data_vencimento_registro", "medicamentos", "data_vencimento_registro, id"
+    )
+    create_index_concurrently(
+        conn, "ix_medicamentos_data_finalizacao_processo", "medicamentos", "data_finalizacao_processo, id"
+    )
@@ -0,0 +1,8 @@
+"""
+Version of the source file behind each dataset generation (ETag / Last-Modified
+of the ANVISA URL), compared by the refresh scheduler before re-importing.
+"""
+
+
+def upgrade(conn):
+    conn.exec_driver_sql("ALTER TABLE dataset_generations ADD COLUMN IF NOT EXISTS source_version TEXT")
@@ -0,0 +1,28 @@
+"""
+Equivalence groups (grupos_equivalencia: products with the same set of active
+ingredients) and medicamentos.grupo_equivalencia_id. Populated by the next run
+of scripts/import_csv.py.
+"""
+from app.migrations import create_index_concurrently
+
+transactional = False
+
+
+def upgrade(conn):
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS grupos_equivalencia (
+            id SERIAL PRIMARY KEY,
+            chave TEXT NOT NULL UNIQUE,
+            nome TEXT NOT NULL,
+            total_medicamentos INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.exec_driver_sql(
+        "ALTER TABLE medicamentos ADD COLUMN IF NOT EXISTS grupo_equivalencia_id INTEGER "
+        "REFERENCES grupos_equivalencia (id)"
+    )
+    create_index_concurrently(conn, "ix_grupos_equivalencia_id", "grupos_equivalencia", "id")
+    # Group -> products, by categoria then id (and one categoria of a group, by id)
+    create_index_concurrently(
+        conn, "ix_medicamentos_grupo_equivalencia", "medicamentos", "grupo_equivalencia_id, categoria_regulatoria, id"
+    )
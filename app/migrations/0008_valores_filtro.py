@@ -0,0 +1,23 @@
+"""
+Exact-match situacao / categoria_regulatoria filters: the valores_filtro value
+list (populated by the next run of scripts/import_csv.py) and B-tree indexes on
+both columns.
+"""
+from app.migrations import create_index_concurrently
+
+transactional = False
+
+
+def upgrade(conn):
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS valores_filtro (
+            campo VARCHAR(50) NOT NULL,
+            valor VARCHAR(100) NOT NULL,
+            total_medicamentos INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (campo, valor)
+        )
+    """)
+    create_index_concurrently(conn, "ix_medicamentos_situacao_registro", "medicamentos", "situacao_registro, id")
+    create_index_concurrently(
+        conn, "ix_medicamentos_categoria_regulatoria", "medicamentos", "categoria_regulatoria, id"
+    )
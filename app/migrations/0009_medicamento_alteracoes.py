@@ -0,0 +1,33 @@
+"""
+Change feed between dataset generations: registros_versoes (content hash per
+registration as of the latest import), medicamento_alteracoes (the changes each
+import made) and an index on medicamentos.numero_registro_produto. The next run
+of scripts/import_csv.py records every registration as added.
+"""
+from app.migrations import create_index_concurrently
+
+transactional = False
+
+
+def upgrade(conn):
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS registros_versoes (
+            numero_registro_produto VARCHAR(50) PRIMARY KEY,
+            conteudo_hash VARCHAR(32) NOT NULL,
+            generation_id INTEGER NOT NULL
+        )
+    """)
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS medicamento_alteracoes (
+            id SERIAL PRIMARY KEY,
+            generation_id INTEGER NOT NULL REFERENCES dataset_generations (id) ON DELETE CASCADE,
+            numero_registro_produto VARCHAR(50) NOT NULL,
+            tipo VARCHAR(10) NOT NULL
+        )
+    """)
+    create_index_concurrently(
+        conn, "ix_medicamento_alteracoes_generation", "medicamento_alteracoes", "generation_id, id"
+    )
+    create_index_concurrently(
+        conn, "ix_medicamentos_numero_registro_produto", "medicamentos", "numero_registro_produto"
+    )
@@ -0,0 +1,129 @@
+"""
+Versioned schema migrations, applied by `python scripts/migrate.py` as a separate
+deploy step (never at worker boot). The app only checks the schema version on
+startup (verify_schema).
+
+Each migration is a module `NNNN_description.py` in this package defining
+`upgrade(conn)`. Modules that set `transactional = False` run on an AUTOCOMMIT
+connection, which is required for CREATE INDEX CONCURRENTLY (see
+create_index_concurrently); those must be idempotent so a failed run can be retried.
+"""
+import importlib
+import pkgutil
+from dataclasses import dataclass
+from types import ModuleType
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+# Arbitrary constant: serializes concurrent migration runs (pg_advisory_lock)
+MIGRATION_LOCK_ID = 7_212_026_033
+VERSION_TABLE = "schema_version"
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    module: ModuleType
+
+    @property
+    def transactional(self) -> bool:
+        return getattr(self.module, "transactional", True)
+
+
+def load_migrations() -> list[Migration]:
+    migrations = []
+    for info in pkgutil.iter_modules(__path__):
+        prefix, _, name = info.name.partition("_")
+        if not prefix.isdigit():
+            continue
+        module = importlib.import_module(f"{__name__}.{info.name}")
+        migrations.append(Migration(version=int(prefix), name=name, module=module))
+    migrations.sort(key=lambda m: m.version)
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions: {versions}")
+    return migrations
+
+
+def current_version(conn: Connection) -> int:
+    """Applied schema version (0 when migrations have never run)"""
+    exists = conn.execute(text("SELECT to_regclass(:name)"), {"name": VERSION_TABLE}).scalar()
+    if exists is None:
+        return 0
+    return conn.execute(text(f"SELECT COALESCE(MAX(version), 0) FROM {VERSION_TABLE}")).scalar()
+
+
+def create_index_concurrently(
+    conn: Connection, name: str, table: str, columns: str, unique: bool = False, using: Optional[str] = None,
+    where: Optional[str] = None,
+) -> None:
+    """
+    CREATE INDEX CONCURRENTLY (no write lock on the table). A failed concurrent build
+    leaves an INVALID index behind; it is dropped and rebuilt on the next run.
+    Must run in a non-transactional migration.
+    """
+    invalid = conn.execute(text(
+        "SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name"
+    ), {"name": name}).scalar()
+    if invalid:
+        conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    conn.exec_driver_sql(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} "
+        f"ON {table} {f'USING {using} ' if using else ''}({columns})"
+        f"{f' WHERE {where}' if where else ''}"
+    )
+
+
+def migrate(engine: Engine, target: Optional[int] = None) -> list[int]:
+    """Apply pending migrations up to `target` (default: all). Returns the versions applied."""
+    applied = []
+    with engine.connect() as lock_conn:
+        lock_conn = lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+        lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            lock_conn.exec_driver_sql(
+                f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+                "version INTEGER PRIMARY KEY, "
+                "name VARCHAR(200) NOT NULL, "
+                "applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now())"
+            )
+            version = current_version(lock_conn)
+            for migration in MIGRATIONS:
+                if migration.version <= version or (target is not None and migration.version > target):
+                    continue
+                print(f"Applying migration {migration.version:04d} {migration.name}...")
+                record = text(f"INSERT INTO {VERSION_TABLE} (version, name) VALUES (:version, :name)")
+                params = {"version": migration.version, "name": migration.name}
+                if migration.transactional:
+                    with engine.begin() as conn:
+                        migration.module.upgrade(conn)
+                        conn.execute(record, params)
+                else:
+                    migration.module.upgrade(lock_conn)
+                    lock_conn.execute(record, params)
+                applied.append(migration.version)
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+    return applied
+
+
+def verify_schema(engine: Engine) -> int:
+    """Raise if the database schema is behind this code. Cheap: a single query."""
+    with engine.connect() as conn:
+        version = current_version(conn)
+    if version < SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema is at version {version}, this code needs {SCHEMA_VERSION}. "
+            "Run `python scripts/migrate.py` before starting the app."
+        )
+    return version
+
+
+# Loaded last: migration modules may import the helpers above
+MIGRATIONS = load_migrations()
+# Schema version this code expects
+SCHEMA_VERSION = MIGRATIONS[-1].version if MIGRATIONS else 0
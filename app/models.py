@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, Date, Boolean, DateTime, Text, ForeignKey, Table, Index
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -16,11 +16,85 @@ class Medicamento(Base):
     numero_processo = Column(String(100), nullable=True)
     classe_terapeutica = Column(String(500), nullable=True)
     empresa_detentora_registro = Column(Text, nullable=True)
+    # Parsed from empresa_detentora_registro ("CNPJ - RAZÃO SOCIAL") by the importer
+    empresa_cnpj = Column(String(14), ForeignKey("empresas.cnpj"), nullable=True)
     situacao_registro = Column(String(100), nullable=True)
     principio_ativo = Column(Text, nullable=True)
+    # Same set of active ingredients (app.equivalencias), set by the importer
+    grupo_equivalencia_id = Column(Integer, ForeignKey("grupos_equivalencia.id"), nullable=True)
+    # Accent/case-folded copies for search (app.text.normalize_search_text), trigram-indexed
+    nome_produto_busca = Column(String(500), nullable=True)
+    principio_ativo_busca = Column(Text, nullable=True)
+    classe_terapeutica_busca = Column(String(500), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        # Company -> products lookups, already ordered by id
+        Index("ix_medicamentos_empresa_cnpj", "empresa_cnpj", "id"),
+        # Date-range filters and /medicamentos/vencendo (ordered range scans)
+        Index("ix_medicamentos_data_vencimento_registro", "data_vencimento_registro", "id"),
+        Index("ix_medicamentos_data_finalizacao_processo", "data_finalizacao_processo", "id"),
+        # Current rows of a registration, for the change feed (app.alteracoes)
+        Index("ix_medicamentos_numero_registro_produto", "numero_registro_produto"),
+        # Exact-match situacao / categoria_regulatoria filters (app.filtros)
+        Index("ix_medicamentos_situacao_registro", "situacao_registro", "id"),
+        Index("ix_medicamentos_categoria_regulatoria", "categoria_regulatoria", "id"),
+        # /medicamentos/{id}/equivalentes: a group's products by categoria, or one categoria of it
+        Index("ix_medicamentos_grupo_equivalencia", "grupo_equivalencia_id", "categoria_regulatoria", "id"),
+    )
+
+
+class Empresa(Base):
+    """Registration holder, keyed by CNPJ (14 digits, no punctuation)."""
+    __tablename__ = "empresas"
+
+    cnpj = Column(String(14), primary_key=True)
+    razao_social = Column(String(500), nullable=False)
+    razao_social_busca = Column(String(500), nullable=True)
+    total_medicamentos = Column(Integer, nullable=False, default=0)
+
+
+# Many-to-many: which active ingredients each medicamento contains (rebuilt by the importer)
+medicamento_principios = Table(
+    "medicamento_principios",
+    Base.metadata,
+    Column("medicamento_id", Integer, ForeignKey("medicamentos.id", ondelete="CASCADE"), primary_key=True),
+    Column("principio_ativo_id", Integer, ForeignKey("principios_ativos.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_medicamento_principios_principio", "principio_ativo_id", "medicamento_id"),
+)
+
+
+class PrincipioAtivo(Base):
+    """Active ingredient dimension, split from Medicamento.principio_ativo (e.g. "PARACETAMOL + CAFEÍNA")."""
+    __tablename__ = "principios_ativos"
+
+    id = Column(Integer, primary_key=True, index=True)
+    nome = Column(String(500), nullable=False)
+    # Normalized key (app.text.normalize_search_text); ids stay stable across imports
+    nome_busca = Column(String(500), unique=True, nullable=False)
+    total_medicamentos = Column(Integer, nullable=False, default=0)
+
+
+class GrupoEquivalencia(Base):
+    """Products with exactly the same set of active ingredients (e.g. every "DIPIRONA + CAFEÍNA")."""
+    __tablename__ = "grupos_equivalencia"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Sorted normalized ingredient keys joined by " + "; ids stay stable across imports
+    chave = Column(Text, unique=True, nullable=False)
+    nome = Column(Text, nullable=False)
+    total_medicamentos = Column(Integer, nullable=False, default=0)
+
+
+class ValorFiltro(Base):
+    """Distinct values of an exact-match filter column (app.filtros), recorded by the importer."""
+    __tablename__ = "valores_filtro"
+
+    campo = Column(String(50), primary_key=True)  # query parameter, e.g. "situacao"
+    valor = Column(String(100), primary_key=True)
+    total_medicamentos = Column(Integer, nullable=False, default=0)
+
 
 class APIKey(Base):
     __tablename__ = "api_keys"
@@ -31,3 +105,53 @@ class APIKey(Base):
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     last_used_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class APIKeyUsage(Base):
+    """
+    Shared per-key request counters (one row per key and period, reset when the
+    window rolls over). Updated with atomic upserts so every worker sees the same count.
+    """
+    __tablename__ = "api_key_usage"
+
+    api_key_id = Column(Integer, ForeignKey("api_keys.id", ondelete="CASCADE"), primary_key=True)
+    period = Column(String(10), primary_key=True)  # "minute" or "day"
+    window_start = Column(DateTime(timezone=True), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class DatasetGeneration(Base):
+    """One row per successful import; its id versions snapshots and caches."""
+    __tablename__ = "dataset_generations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(Text, nullable=True)
+    # ETag / Last-Modified of the source URL when imported (see app.scheduler)
+    source_version = Column(Text, nullable=True)
+    row_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class RegistroVersao(Base):
+    """Content hash of each registration as of the latest generation, diffed by the next import."""
+    __tablename__ = "registros_versoes"
+
+    numero_registro_produto = Column(String(50), primary_key=True)
+    conteudo_hash = Column(String(32), nullable=False)
+    generation_id = Column(Integer, nullable=False)
+
+
+class MedicamentoAlteracao(Base):
+    """Change feed: one row per registration added, modified or removed by an import."""
+    __tablename__ = "medicamento_alteracoes"
+
+    # Assigned in generation order: the keyset cursor of /medicamentos/changes
+    id = Column(Integer, primary_key=True)
+    generation_id = Column(Integer, ForeignKey("dataset_generations.id", ondelete="CASCADE"), nullable=False)
+    numero_registro_produto = Column(String(50), nullable=False)
+    tipo = Column(String(10), nullable=False)  # "added", "modified" or "removed"
+
+    __table_args__ = (
+        # First change after a generation (since -> cursor)
+        Index("ix_medicamento_alteracoes_generation", "generation_id", "id"),
+    )
@@ -0,0 +1,306 @@
+"""
+Slow-query log and on-demand route profiling.
+
+install_query_hooks(engine) times every statement with SQLAlchemy cursor events:
+statements slower than SLOW_QUERY_MS are logged with their parameters, and a
+SLOW_QUERY_EXPLAIN_RATE sample of the slow SELECTs is re-run under
+EXPLAIN (ANALYZE, BUFFERS) on a raw cursor (inside a savepoint, so a failure
+cannot abort the request's transaction).
+
+install_route_profiling(app) wraps each API route so that, once armed through
+/admin/profile, the next N requests of that route run under cProfile. Each
+request is split into the phases that matter for "SQL, ORM or Pydantic?":
+
+  sql            time inside cursor.execute (from the query hooks)
+  endpoint       the route function: SQL plus ORM hydration
+  validation     response_model validation of the returned value (ORM objects ->
+                 Pydantic models; routes that build the model themselves do
+                 this inside `endpoint`)
+  serialization  Pydantic models -> JSON-compatible data
+  total          the route's ASGI handler, dependencies included
+
+Profiles are per worker process: arm every worker, or run a single one.
+"""
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+from app.database import settings
+from app.timing import current_timings, timing_span
+
+logger = logging.getLogger("app.sql")
+
+MAX_LOGGED_STATEMENT = 2000
+MAX_LOGGED_PARAMETERS = 500
+PHASES = ("total", "endpoint", "sql", "validation", "serialization")
+
+
+class RequestProfile:
+    """Timings and cProfile data of one profiled request (shared by the threads that serve it)"""
+
+    def __init__(self):
+        self.phases_ms = dict.fromkeys(PHASES, 0.0)
+        self.sql_statements = 0
+        self.profiles: list[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, elapsed_ms: float, profile: Optional[cProfile.Profile] = None) -> None:
+        with self._lock:
+            self.phases_ms[phase] += elapsed_ms
+            if phase == "sql":
+                self.sql_statements += 1
+            if profile is not None:
+                self.profiles.append(profile)
+
+
+# Set for the duration of a profiled request; None otherwise
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+
+# --- Slow-query log ---------------------------------------------------------
+
+def _explain(cursor, statement: str, parameters) -> Optional[str]:
+    """EXPLAIN ANALYZE on a raw cursor of the same connection (bypasses the events)"""
+    dbapi_conn = cursor.connection
+    explain_cursor = dbapi_conn.cursor()
+    in_transaction = not dbapi_conn.autocommit
+    try:
+        if in_transaction:
+            explain_cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            explain_cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)
+            plan = "\n".join(row[0] for row in explain_cursor.fetchall())
+        except Exception as e:
+            if in_transaction:
+                explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return f"(EXPLAIN failed: {e.__class__.__name__}: {e})"
+        if in_transaction:
+            explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        return plan
+    finally:
+        explain_cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_started"].pop()) * 1000
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.add("sql", elapsed_ms)
+    timings = current_timings()
+    if timings is not None:
+        timings.add_statement(elapsed_ms)
+
+    if settings.slow_query_ms <= 0 or elapsed_ms < settings.slow_query_ms:
+        return
+    logger.warning(
+        "Slow query %.1fms: %s params=%s",
+        elapsed_ms,
+        statement[:MAX_LOGGED_STATEMENT],
+        repr(parameters)[:MAX_LOGGED_PARAMETERS],
+    )
+    if (
+        not executemany
+        and statement.lstrip()[:6].upper() == "SELECT"
+        and conn.dialect.name == "postgresql"
+        and random.random() < settings.slow_query_explain_rate
+    ):
+        logger.warning("EXPLAIN ANALYZE of the slow query:\n%s", _explain(cursor, statement, parameters))
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute: drop its start time
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def install_query_hooks(engine) -> None:
+    """Time every statement on `engine` (slow-query log, profiled requests)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+# --- Route profiling --------------------------------------------------------
+
+class RouteProfiler:
+    """Profiles the next N requests of one route and aggregates them"""
+
+    def __init__(self):
+        self.route_key: Optional[tuple[str, str]] = None
+        self.requested = 0
+        self.remaining = 0
+        self.profiled = 0
+        self.phases_ms = dict.fromkeys(PHASES, 0.0)
+        self.sql_statements = 0
+        self.stats: Optional[pstats.Stats] = None
+        self._lock = threading.Lock()
+
+    def arm(self, method: str, path: str, requests: int) -> None:
+        with self._lock:
+            self.route_key = (method, path)
+            self.requested = self.remaining = requests
+            self.profiled = 0
+            self.phases_ms = dict.fromkeys(PHASES, 0.0)
+            self.sql_statements = 0
+            self.stats = None
+
+    def disarm(self) -> None:
+        with self._lock:
+            self.remaining = 0
+
+    def claim(self, method: str, path: str) -> bool:
+        """Take one of the remaining slots for a request of this route"""
+        if not self.remaining or self.route_key != (method, path):
+            return False
+        with self._lock:
+            if not self.remaining or self.route_key != (method, path):
+                return False
+            self.remaining -= 1
+            return True
+
+    def record(self, request_profile: RequestProfile) -> None:
+        with self._lock:
+            self.profiled += 1
+            for phase, elapsed_ms in request_profile.phases_ms.items():
+                self.phases_ms[phase] += elapsed_ms
+            self.sql_statements += request_profile.sql_statements
+            for profile in request_profile.profiles:
+                if self.stats is None:
+                    self.stats = pstats.Stats(profile, stream=io.StringIO())
+                else:
+                    self.stats.add(profile)
+
+    def report(self, sort: str = "cumulative", top: int = 30) -> dict:
+        with self._lock:
+            count = self.profiled
+            report = {
+                "method": self.route_key[0] if self.route_key else None,
+                "path": self.route_key[1] if self.route_key else None,
+                "requested": self.requested,
+                "profiled": count,
+                "remaining": self.remaining,
+                "avg_phases_ms": {
+                    phase: round(total / count, 3) if count else 0.0 for phase, total in self.phases_ms.items()
+                },
+                "avg_sql_statements": round(self.sql_statements / count, 2) if count else 0.0,
+                "functions": [],
+            }
+            if self.stats is None:
+                return report
+            sort_index = 3 if sort == "cumulative" else 2
+            rows = sorted(self.stats.stats.items(), key=lambda item: item[1][sort_index], reverse=True)
+            for (filename, line, name), (_, calls, tottime, cumtime, _) in rows[:top]:
+                report["functions"].append({
+                    "function": f"{filename}:{line}({name})",
+                    "calls": calls,
+                    "tottime_ms": round(tottime * 1000, 3),
+                    "cumtime_ms": round(cumtime * 1000, 3),
+                })
+            return report
+
+
+route_profiler = RouteProfiler()
+
+
+def _run_profiled(phase: str, fn, *args, **kwargs):
+    """Run fn; inside a profiled request, time it and collect a cProfile for it"""
+    request_profile = _current_profile.get()
+    if request_profile is None:
+        return fn(*args, **kwargs)
+    profile = cProfile.Profile()
+    started = time.perf_counter()
+    profile.enable()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profile.disable()
+        request_profile.add(phase, (time.perf_counter() - started) * 1000, profile)
+
+
+def _wrap_phase(phase: str, fn, timing_name: Optional[str] = None):
+    """Time fn as a profiling phase and, when `timing_name` is set, as a Server-Timing span"""
+    def wrapper(*args, **kwargs):
+        if timing_name is None:
+            return _run_profiled(phase, fn, *args, **kwargs)
+        with timing_span(timing_name):
+            return _run_profiled(phase, fn, *args, **kwargs)
+    return wrapper
+
+
+def _wrap_endpoint(call):
+    if asyncio.iscoroutinefunction(call):
+        async def endpoint(*args, **kwargs):
+            request_profile = _current_profile.get()
+            if request_profile is None:
+                return await call(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                request_profile.add("endpoint", (time.perf_counter() - started) * 1000)
+        return endpoint
+
+    return _wrap_phase("endpoint", call)
+
+
+def _wrap_route_app(route: APIRoute, methods: set[str]):
+    handler = route.app
+
+    async def app(scope, receive, send):
+        method = scope["method"]
+        if method not in methods or not route_profiler.claim(method, route.path):
+            await handler(scope, receive, send)
+            return
+        request_profile = RequestProfile()
+        token = _current_profile.set(request_profile)
+        started = time.perf_counter()
+        try:
+            await handler(scope, receive, send)
+        finally:
+            request_profile.add("total", (time.perf_counter() - started) * 1000)
+            _current_profile.reset(token)
+            route_profiler.record(request_profile)
+
+    return app
+
+
+def install_route_profiling(app) -> None:
+    """
+    Instrument every APIRoute of `app` (call after the routers are included).
+    Outside profiled requests the wrappers cost one ContextVar lookup.
+    """
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        # FastAPI reads these at request time from the same objects, so wrapping them in place is enough
+        route.dependant.call = _wrap_endpoint(route.dependant.call)
+        # The field the request handler validates with (the response_field itself under Pydantic v2)
+        field = route.secure_cloned_response_field
+        if field is not None and hasattr(field, "serialize"):
+            field.validate = _wrap_phase("validation", field.validate, "serialization")
+            field.serialize = _wrap_phase("serialization", field.serialize, "serialization")
+        route.app = _wrap_route_app(route, route.methods)
+
+
+def find_route(app, method: str, path: str) -> Optional[APIRoute]:
+    """The APIRoute with this method and path template (e.g. /api/v1/medicamentos/{medicamento_id})"""
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.path == path and method in route.methods:
+            return route
+    return None
+
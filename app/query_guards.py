@@ -0,0 +1,65 @@
+"""
+Guards against unselective or runaway catalogue queries:
+
+- read sessions run with a per-request statement_timeout (STATEMENT_TIMEOUT_MS);
+  a cancelled query becomes a 503 with Retry-After instead of holding a pooled
+  connection for as long as it takes
+- text terms shorter than MIN_SEARCH_LENGTH are rejected with 400 ("a" matches
+  almost every row and no index helps)
+- counts for text searches stop at COUNT_LIMIT rows; larger results report
+  total=COUNT_LIMIT with total_exact=false instead of counting the whole table
+"""
+import logging
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Query
+
+from app.database import is_statement_timeout, settings
+from app.timing import timing_span
+
+logger = logging.getLogger(__name__)
+
+# Seconds suggested to clients after a statement timeout
+TIMEOUT_RETRY_AFTER = 5
+
+
+def check_term_length(term: Optional[str], name: str) -> None:
+    """400 for a (normalized) text term too short to be selective"""
+    if term and len(term) < settings.min_search_length:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{name} must have at least {settings.min_search_length} characters"
+        )
+
+
+def count_capped(query: Query, limit: Optional[int] = None) -> tuple[int, bool]:
+    """
+    Count the query's rows, stopping after `limit` (COUNT_LIMIT by default; 0 counts
+    everything). Returns (count, exact); when not exact the count is `limit`.
+    Reported as the `count` Server-Timing span.
+    """
+    limit = settings.count_limit if limit is None else limit
+    with timing_span("count"):
+        if limit <= 0:
+            return query.count(), True
+        subquery = query.order_by(None).limit(limit + 1).subquery()
+        count = query.session.query(func.count()).select_from(subquery).scalar()
+    if count > limit:
+        return limit, False
+    return count, True
+
+
+async def statement_timeout_handler(request: Request, exc: OperationalError):
+    """503 + Retry-After for cancelled statements; any other OperationalError stays a 500"""
+    if not is_statement_timeout(exc):
+        raise exc
+    logger.warning("Statement timeout on %s %s", request.method, request.url.path)
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Query took too long; narrow the filters or try again later"},
+        headers={"Retry-After": str(TIMEOUT_RETRY_AFTER)},
+    )
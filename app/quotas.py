@@ -0,0 +1,165 @@
+"""
+Per-API-key rate limits (requests per minute) and daily quotas, shared across
+uvicorn workers and replicas through the api_key_usage table.
+
+Each worker batches increments locally and syncs with PostgreSQL every
+QUOTA_SYNC_BATCH requests or QUOTA_SYNC_INTERVAL seconds per key (and always on
+the first request of a window), so the shared store is not hit on every request.
+The overshoot is bounded by workers * QUOTA_SYNC_BATCH per window.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException, status
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.database import settings
+from app.models import APIKeyUsage
+
+PERIOD_SECONDS = {"minute": 60, "day": 86400}
+
+
+@dataclass
+class _Counter:
+    window_start: datetime
+    shared: int = 0  # last count seen in the shared store
+    pending: int = 0  # local increments not yet synced
+    synced_at: float = 0.0
+
+
+@dataclass
+class QuotaStatus:
+    period: str
+    limit: int
+    remaining: int
+    reset: datetime
+
+
+def _window_start(now: datetime, period: str) -> datetime:
+    if period == "minute":
+        return now.replace(second=0, microsecond=0)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class QuotaTracker:
+    def __init__(self, limits: dict[str, int], sync_batch: int, sync_interval: float):
+        # Periods with a limit of 0 are disabled
+        self.limits = {period: limit for period, limit in limits.items() if limit > 0}
+        self.sync_batch = max(sync_batch, 1)
+        self.sync_interval = sync_interval
+        self._counters: dict[tuple[int, str], _Counter] = {}
+        self._lock = threading.Lock()
+
+    def consume(self, api_key_id: int, db: Session) -> list[QuotaStatus]:
+        """
+        Count one request for the key. Raises 429 (with Retry-After) when any
+        period is exhausted; rejected requests are not counted.
+        """
+        now = datetime.now(timezone.utc)
+        to_sync = []
+        with self._lock:
+            counters = {}
+            for period in self.limits:
+                start = _window_start(now, period)
+                counter = self._counters.get((api_key_id, period))
+                if counter is None or counter.window_start < start:
+                    if counter is not None and counter.pending:
+                        to_sync.append((period, counter.window_start, counter.pending, None))
+                    counter = _Counter(window_start=start)
+                    self._counters[(api_key_id, period)] = counter
+                counters[period] = counter
+
+            for period, counter in counters.items():
+                if counter.shared + counter.pending >= self.limits[period]:
+                    reset = counter.window_start + timedelta(seconds=PERIOD_SECONDS[period])
+                    retry_after = max(int((reset - now).total_seconds()) + 1, 1)
+                    raise HTTPException(
+                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                        detail=f"API key {'daily quota' if period == 'day' else 'rate limit'} exceeded",
+                        headers={
+                            "Retry-After": str(retry_after),
+                            **_headers([QuotaStatus(period, self.limits[period], 0, reset)]),
+                        },
+                    )
+
+            monotonic_now = time.monotonic()
+            for period, counter in counters.items():
+                counter.pending += 1
+                if (
+                    counter.synced_at == 0.0
+                    or counter.pending >= self.sync_batch
+                    or monotonic_now - counter.synced_at >= self.sync_interval
+                ):
+                    to_sync.append((period, counter.window_start, counter.pending, counter))
+                    counter.pending = 0
+                    counter.synced_at = monotonic_now
+
+        for period, window_start, increment, counter in to_sync:
+            shared = self._sync(db, api_key_id, period, window_start, increment)
+            if counter is not None:
+                with self._lock:
+                    counter.shared = max(counter.shared, shared)
+
+        statuses = []
+        for period, counter in counters.items():
+            limit = self.limits[period]
+            statuses.append(QuotaStatus(
+                period=period,
+                limit=limit,
+                remaining=max(limit - counter.shared - counter.pending, 0),
+                reset=counter.window_start + timedelta(seconds=PERIOD_SECONDS[period]),
+            ))
+        return statuses
+
+    def _sync(self, db: Session, api_key_id: int, period: str, window_start: datetime, increment: int) -> int:
+        """
+        Atomically add `increment` to the shared counter and return its new value.
+        A row from an older window is reset; a late flush for an older window is ignored.
+        """
+        stmt = insert(APIKeyUsage).values(
+            api_key_id=api_key_id, period=period, window_start=window_start, count=increment
+        )
+        current = APIKeyUsage.__table__.c
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[current.api_key_id, current.period],
+            set_={
+                "count": case(
+                    (current.window_start == stmt.excluded.window_start, current.count + stmt.excluded.count),
+                    (current.window_start < stmt.excluded.window_start, stmt.excluded.count),
+                    else_=current.count,
+                ),
+                "window_start": func.greatest(current.window_start, stmt.excluded.window_start),
+            },
+        ).returning(current.count, current.window_start)
+        count, stored_window = db.execute(stmt).one()
+        db.commit()
+        return count if stored_window == window_start else 0
+
+
+def _headers(statuses: list[QuotaStatus]) -> dict[str, str]:
+    """X-RateLimit-* for the per-minute limit, X-RateLimit-Daily-* for the daily quota"""
+    headers = {}
+    for quota in statuses:
+        prefix = "X-RateLimit-Daily" if quota.period == "day" else "X-RateLimit"
+        headers[f"{prefix}-Limit"] = str(quota.limit)
+        headers[f"{prefix}-Remaining"] = str(quota.remaining)
+        headers[f"{prefix}-Reset"] = str(int(quota.reset.timestamp()))
+    return headers
+
+
+quota_tracker = QuotaTracker(
+    {"minute": settings.rate_limit_per_minute, "day": settings.daily_quota},
+    sync_batch=settings.quota_sync_batch,
+    sync_interval=settings.quota_sync_interval,
+)
+
+
+def enforce_quota(api_key_id: int, db: Session) -> dict[str, str]:
+    """Count a request against the key's limits; returns the X-RateLimit-* headers."""
+    if not quota_tracker.limits:
+        return {}
+    return _headers(quota_tracker.consume(api_key_id, db))
@@ -1,15 +1,109 @@
 """
 In-memory rate limiter for public endpoints (e.g. API key registration).
 Not distributed: resets on app restart. Sufficient for single-instance deploy.
+
+Each client costs O(1) memory (a sliding-window counter: current and previous
+window counts) and the number of tracked clients is capped with an LRU, so
+churning or spoofed X-Forwarded-For values cannot grow memory without bound.
 """
+import threading
 import time
-from collections import defaultdict
+from collections import OrderedDict
+from typing import Callable, Optional
+
 from fastapi import Request, HTTPException, status
 
-# ip -> list of request timestamps (within window)
-_store: dict[str, list[float]] = defaultdict(list)
 WINDOW_SECONDS = 3600  # 1 hour
 MAX_REQUESTS_PER_WINDOW = 5
+# Upper bound on tracked clients; least recently seen clients are evicted first
+MAX_TRACKED_CLIENTS = 100_000
+SWEEP_INTERVAL_SECONDS = 60
+
+
+class SlidingWindowLimiter:
+    """
+    Sliding-window counter per key. The request rate is estimated as
+    previous_count * (1 - elapsed fraction of current window) + current_count,
+    which approximates a true sliding window with two integers per key.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        window_seconds: float,
+        max_keys: int = MAX_TRACKED_CLIENTS,
+        sweep_interval: float = SWEEP_INTERVAL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        # key -> [window_index, current_count, previous_count], in LRU order
+        self._entries: "OrderedDict[str, list[int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = clock() + sweep_interval
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def hit(self, key: str) -> tuple[bool, float]:
+        """
+        Count one request for `key`. Returns (allowed, retry_after_seconds);
+        rejected requests are not counted.
+        """
+        now = self._clock()
+        window = int(now // self.window_seconds)
+        elapsed = (now % self.window_seconds) / self.window_seconds
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(window)
+                self._next_sweep = now + self.sweep_interval
+
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = [window, 0, 0]
+                self._entries[key] = entry
+                if len(self._entries) > self.max_keys:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+                if entry[0] != window:
+                    # Roll the window forward; anything older than one window contributes nothing
+                    entry[2] = entry[1] if entry[0] == window - 1 else 0
+                    entry[1] = 0
+                    entry[0] = window
+
+            estimated = entry[2] * (1 - elapsed) + entry[1]
+            if estimated >= self.limit:
+                return False, self._retry_after(entry, elapsed)
+            entry[1] += 1
+            return True, 0.0
+
+    def _retry_after(self, entry: list[int], elapsed: float) -> float:
+        """Seconds until the estimate drops below the limit (upper bound: end of next window)"""
+        previous, current = entry[2], entry[1]
+        if current >= self.limit or previous == 0:
+            return (1 - elapsed) * self.window_seconds
+        # Solve previous * (1 - t) + current < limit for t within the current window
+        needed = 1 - (self.limit - current) / previous
+        return max(needed - elapsed, 0.0) * self.window_seconds
+
+    def _sweep(self, window: int) -> None:
+        """Drop keys idle for more than a full window, oldest first (LRU front)"""
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry[0] >= window - 1:
+                break
+            del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_limiter = SlidingWindowLimiter(MAX_REQUESTS_PER_WINDOW, WINDOW_SECONDS)
 
 
 def get_client_ip(request: Request) -> str:
@@ -22,17 +116,12 @@ def get_client_ip(request: Request) -> str:
     return "unknown"
 
 
-def check_rate_limit(request: Request) -> None:
+def check_rate_limit(request: Request, limiter: Optional[SlidingWindowLimiter] = None) -> None:
     """Raises 429 if IP has exceeded MAX_REQUESTS_PER_WINDOW in WINDOW_SECONDS."""
-    ip = get_client_ip(request)
-    now = time.monotonic()
-    # Use monotonic for relative TTL; store (monotonic_start, timestamp) or just timestamps
-    # Simple: store time.time() and expire entries older than WINDOW_SECONDS
-    cutoff = time.time() - WINDOW_SECONDS
-    _store[ip] = [t for t in _store[ip] if t > cutoff]
-    if len(_store[ip]) >= MAX_REQUESTS_PER_WINDOW:
+    allowed, retry_after = (limiter or _limiter).hit(get_client_ip(request))
+    if not allowed:
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail="Too many API key requests. Try again later.",
+            headers={"Retry-After": str(max(int(retry_after), 1))},
         )
-    _store[ip].append(time.time())
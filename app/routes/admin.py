@@ -1,16 +1,27 @@
 """
-Admin endpoints (require API Key). E.g. trigger CSV import via URL.
+Admin endpoints (require API Key). E.g. trigger CSV import via URL or upload.
 """
 import asyncio
+import codecs
+import queue
 import subprocess
 import sys
+import threading
 from pathlib import Path
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import BaseModel, Field
 
+from app.admission import gates
 from app.auth import get_api_key
+from app.database import SessionLocal, settings
+from app.profiling import find_route, route_profiler
+from app.uploads import iter_upload, upload_charset
+from scripts.import_csv import (
+    IMPORT_LOCKED_EXIT_CODE, SAMPLE_SIZE, ImportLocked, detect_encoding_sample, import_lock, import_rows, iter_csv_rows, iter_decoded_lines,
+    missing_columns,
+)
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -19,6 +30,22 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent  # app/routes -> ap
 SCRIPTS_DIR = PROJECT_ROOT / "scripts"
 # Default: ANVISA open data URL (import always from URL, not local file)
 DEFAULT_CSV_URL = "https://dados.anvisa.gov.br/dados/DADOS_ABERTOS_MEDICAMENTOS.csv"
+# Upload chunks buffered between the request stream and the loader thread (backpressure)
+UPLOAD_QUEUE_SIZE = 64
+_END_OF_UPLOAD = object()
+_UPLOAD_ABORTED = object()
+_upload_lock = threading.Lock()
+
+
+class UploadAborted(Exception):
+    """The upload stream failed before the end; the import transaction is rolled back"""
+
+
+class ProfileRequest(BaseModel):
+    """Route to profile: path template as in /docs, e.g. /api/v1/medicamentos/{medicamento_id}"""
+    path: str
+    method: str = "GET"
+    requests: int = Field(10, ge=1, le=1000)
 
 
 class ImportRequest(BaseModel):
@@ -64,6 +91,8 @@ async def run_import(
         result = await asyncio.to_thread(_run)
     except subprocess.TimeoutExpired:
         raise HTTPException(504, detail="Import timed out (max 1h)")
+    if result.returncode == IMPORT_LOCKED_EXIT_CODE:
+        raise HTTPException(409, detail="Another import is running")
 
     return {
         "ok": result.returncode == 0,
@@ -71,3 +100,168 @@ async def run_import(
         "stdout": result.stdout,
         "stderr": result.stderr,
     }
+
+
+@router.post("/profile")
+def start_profile(
+    body: ProfileRequest,
+    request: Request,
+    api_key: str = Depends(get_api_key),
+):
+    """
+    Profile the next `requests` requests of a route in this worker (cProfile plus
+    SQL / endpoint / validation / serialization timings). Replaces any previous profile.
+    """
+    method = body.method.upper()
+    if find_route(request.app, method, body.path) is None:
+        raise HTTPException(404, detail=f"No route {method} {body.path}")
+    route_profiler.arm(method, body.path, body.requests)
+    return route_profiler.report()
+
+
+@router.get("/profile")
+def get_profile(
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime)$"),
+    top: int = Query(30, ge=1, le=200),
+    api_key: str = Depends(get_api_key),
+):
+    """Aggregated profile of the requests profiled so far (averages per request)"""
+    return route_profiler.report(sort=sort, top=top)
+
+
+@router.delete("/profile")
+def stop_profile(api_key: str = Depends(get_api_key)):
+    """Stop profiling; the results collected so far stay available"""
+    route_profiler.disarm()
+    return route_profiler.report()
+
+
+@router.get("/admission")
+def get_admission(api_key: str = Depends(get_api_key)):
+    """Admission gates of this worker: limits, current load and requests shed so far"""
+    return {
+        "threadpool_size": settings.threadpool_size,
+        "db_pool_size": settings.db_pool_size,
+        "db_max_overflow": settings.db_max_overflow,
+        "gates": {name: gate.status() for name, gate in gates.items() if gate is not None},
+    }
+
+
+def _iter_queue(chunks: queue.Queue):
+    while True:
+        chunk = chunks.get()
+        if chunk is _END_OF_UPLOAD:
+            return
+        if chunk is _UPLOAD_ABORTED:
+            raise UploadAborted()
+        yield chunk
+
+
+def _import_from_queue(chunks: queue.Queue, encoding: str, delimiter: str, source: str):
+    """Loader thread: decode and import the queued chunks in one transaction"""
+    with import_lock() as acquired:
+        if not acquired:
+            raise ImportLocked("Another import is running")
+        db = SessionLocal()
+        try:
+            lines = iter_decoded_lines(_iter_queue(chunks), encoding)
+            return import_rows(db, iter_csv_rows(lines, delimiter), source, atomic=True)
+        except BaseException:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+async def _put(chunks: queue.Queue, item, worker: asyncio.Future) -> None:
+    """Queue an item without blocking the event loop; gives up if the loader has stopped"""
+    while not worker.done():
+        try:
+            chunks.put_nowait(item)
+            return
+        except queue.Full:
+            await asyncio.sleep(0.01)
+
+
+@router.post("/import/upload")
+async def upload_import(
+    request: Request,
+    encoding: Optional[str] = Query(
+        None, description="CSV encoding; else the Content-Type charset, else detected from the first 64 KB"
+    ),
+    api_key: str = Depends(get_api_key),
+):
+    """
+    Replace the dataset with an uploaded CSV (ANVISA columns), streamed straight into
+    the loader: multipart/form-data (field `file`) or a raw body (e.g.
+    `curl -T file.csv` or `--data-binary @file.csv -H 'Content-Type: text/csv'`).
+    Nothing is written to disk; the import commits only if the whole upload arrives.
+    """
+    if not _upload_lock.acquire(blocking=False):
+        raise HTTPException(409, detail="An upload import is already running")
+    try:
+        upload = iter_upload(request)
+        # The first chunks pick the encoding and delimiter, then go to the loader too
+        head = []
+        head_size = 0
+        async for chunk in upload:
+            head.append(chunk)
+            head_size += len(chunk)
+            if head_size >= SAMPLE_SIZE:
+                break
+        if not head_size:
+            raise HTTPException(400, detail="Empty upload")
+        detected, delimiter = detect_encoding_sample(b"".join(head)[:SAMPLE_SIZE], prefer_utf8=True)
+        encoding = encoding or upload_charset(request)
+        if encoding:
+            try:
+                encoding = codecs.lookup(encoding).name
+            except LookupError:
+                raise HTTPException(400, detail=f"Unknown encoding: {encoding}")
+        else:
+            encoding = detected
+        if encoding is None:
+            raise HTTPException(400, detail="Could not detect the CSV encoding; pass ?encoding=")
+        # Refuse anything that is not an ANVISA CSV before the current dataset is touched
+        header = next(iter_decoded_lines(head, encoding), "")
+        missing = missing_columns(header, delimiter)
+        if missing:
+            raise HTTPException(400, detail=f"Not an ANVISA medicamentos CSV: missing columns {', '.join(missing)}")
+
+        chunks: queue.Queue = queue.Queue(maxsize=UPLOAD_QUEUE_SIZE)
+        source = f"upload:{request.client.host if request.client else 'unknown'}"
+        worker = asyncio.get_running_loop().run_in_executor(
+            None, _import_from_queue, chunks, encoding, delimiter, source
+        )
+        try:
+            for chunk in head:
+                await _put(chunks, chunk, worker)
+            async for chunk in upload:
+                if worker.done():
+                    break
+                await _put(chunks, chunk, worker)
+        except BaseException:
+            # Client disconnected or malformed multipart: roll the import back
+            await _put(chunks, _UPLOAD_ABORTED, worker)
+            await asyncio.gather(worker, return_exceptions=True)
+            raise
+        await _put(chunks, _END_OF_UPLOAD, worker)
+        try:
+            generation = await worker
+        except ImportLocked as e:
+            raise HTTPException(409, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(500, detail=f"Import failed: {e.__class__.__name__}: {e}")
+    finally:
+        _upload_lock.release()
+
+    return {
+        "ok": True,
+        "source": source,
+        "encoding": encoding,
+        "delimiter": delimiter,
+        "generation": generation.id,
+        "rows": generation.row_count,
+    }
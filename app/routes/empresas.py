@@ -0,0 +1,99 @@
+import re
+
+from fastapi import APIRouter, Depends, Query, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import Optional
+from math import ceil
+
+from app.database import get_read_db
+from app.models import Empresa, Medicamento
+from app.schemas import EmpresaListResponse, EmpresaResponse, MedicamentoListResponse
+from app.auth import get_api_key
+from app.text import LIKE_ESCAPE, normalize_search_text, prefix_pattern
+
+router = APIRouter(prefix="/empresas", tags=["empresas"])
+
+_CNPJ_PUNCTUATION_RE = re.compile(r"[./\-\s]")
+
+
+def _normalize_cnpj(cnpj: str) -> str:
+    """Ignore CNPJ punctuation: "61.190.096-0001.92" -> "61190096000192" """
+    return _CNPJ_PUNCTUATION_RE.sub("", cnpj)
+
+
+def _get_empresa_or_404(db: Session, cnpj: str) -> Empresa:
+    empresa = db.query(Empresa).filter(Empresa.cnpj == _normalize_cnpj(cnpj)).first()
+    if not empresa:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Empresa not found"
+        )
+    return empresa
+
+
+@router.get("", response_model=EmpresaListResponse)
+def list_empresas(
+    q: Optional[str] = Query(None, description="Razão social prefix (accent- and case-insensitive) or CNPJ prefix"),
+    page: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    api_key: str = Depends(get_api_key)
+):
+    """List registration holders (empresas), optionally filtered by name or CNPJ prefix"""
+    query = db.query(Empresa)
+    order = Empresa.razao_social_busca
+    if q and _normalize_cnpj(q).isdigit():
+        query = query.filter(Empresa.cnpj.like(prefix_pattern(_normalize_cnpj(q)), escape=LIKE_ESCAPE))
+        order = Empresa.cnpj
+    else:
+        term = normalize_search_text(q)
+        if term:
+            query = query.filter(Empresa.razao_social_busca.like(prefix_pattern(term), escape=LIKE_ESCAPE))
+
+    total = query.count()
+    items = query.order_by(order, Empresa.cnpj).offset((page - 1) * limit).limit(limit).all()
+    pages = ceil(total / limit) if total > 0 else 0
+
+    return EmpresaListResponse(
+        items=items,
+        total=total,
+        page=page,
+        limit=limit,
+        pages=pages
+    )
+
+
+@router.get("/{cnpj}", response_model=EmpresaResponse)
+def get_empresa(
+    cnpj: str,
+    db: Session = Depends(get_read_db),
+    api_key: str = Depends(get_api_key)
+):
+    """Get registration holder by CNPJ"""
+    return _get_empresa_or_404(db, cnpj)
+
+
+@router.get("/{cnpj}/medicamentos", response_model=MedicamentoListResponse)
+def list_medicamentos_por_empresa(
+    cnpj: str,
+    page: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    api_key: str = Depends(get_api_key)
+):
+    """List medicamentos registered by the company (index on empresa_cnpj, id)"""
+    empresa = _get_empresa_or_404(db, cnpj)
+
+    query = db.query(Medicamento).filter(Medicamento.empresa_cnpj == empresa.cnpj)
+    # Maintained by the importer: avoids a COUNT per request
+    total = empresa.total_medicamentos
+    items = query.order_by(Medicamento.id).offset((page - 1) * limit).limit(limit).all()
+    pages = ceil(total / limit) if total > 0 else 0
+
+    return MedicamentoListResponse(
+        items=items,
+        total=total,
+        page=page,
+        limit=limit,
+        pages=pages
+    )
@@ -1,16 +1,91 @@
-from fastapi import APIRouter, Depends, Query, HTTPException, status
+import csv
+import io
+import json
+import re
+from datetime import date, timedelta
+
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, status
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, func
+from sqlalchemy import func
 from typing import Optional
 from math import ceil
 
-from app.database import get_db
-from app.models import Medicamento
-from app.schemas import MedicamentoResponse, MedicamentoListResponse, StatsResponse
+from app.database import get_read_db, new_read_session
+from app.filtros import FILTER_COLUMNS, resolve_filter_values
+from app.models import DatasetGeneration, GrupoEquivalencia, Medicamento, MedicamentoAlteracao
+from app.schemas import (
+    AlteracaoResponse, AlteracoesResponse, AutocompleteItem, AutocompleteResponse, EquivalentesResponse,
+    MedicamentoResponse, MedicamentoListResponse, StatsResponse,
+)
 from app.auth import get_api_key
+from app.autocomplete import MAX_SUGGESTIONS, autocomplete
+from app.query_guards import check_term_length, count_capped
+from app.sqlite_backend import contains_filter
+from app.text import normalize_search_text
+from app.snapshots import EXPORT_FIELDS, SNAPSHOT_MEDIA_TYPES, export_row, read_manifest, snapshot_path
 
 router = APIRouter(prefix="/medicamentos", tags=["medicamentos"])
 
+# Rows fetched per round-trip from the server-side cursor during export
+EXPORT_BATCH_SIZE = 1000
+# Approximate size (in characters) of each chunk written to the response stream
+EXPORT_CHUNK_SIZE = 64 * 1024
+SNAPSHOT_READ_CHUNK = 64 * 1024
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _check_date_range(name: str, start: Optional[date], end: Optional[date]) -> None:
+    if start and end and start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{name}_de must not be after {name}_ate"
+        )
+
+
+def apply_filters(
+    query,
+    nome: Optional[str] = None,
+    principio_ativo: Optional[str] = None,
+    classe_terapeutica: Optional[str] = None,
+    situacao: Optional[list[str]] = None,
+    categoria_regulatoria: Optional[list[str]] = None,
+    vencimento_de: Optional[date] = None,
+    vencimento_ate: Optional[date] = None,
+    finalizacao_de: Optional[date] = None,
+    finalizacao_ate: Optional[date] = None,
+):
+    """
+    Apply the list_medicamentos filters to a Medicamento query. Text filters match
+    the normalized *_busca columns, so they are accent- and case-insensitive and
+    can use the trigram indexes (FTS5 on a SQLite snapshot). situacao and
+    categoria_regulatoria are exact matches on any of the given values (app.filtros).
+    Date ranges are inclusive and B-tree indexed.
+    """
+    for column, name, value in (
+        (Medicamento.nome_produto_busca, "nome", nome),
+        (Medicamento.principio_ativo_busca, "principio_ativo", principio_ativo),
+        (Medicamento.classe_terapeutica_busca, "classe_terapeutica", classe_terapeutica),
+    ):
+        term = normalize_search_text(value)
+        check_term_length(term, name)
+        if term:
+            query = query.filter(contains_filter(query.session, [column], term))
+    for name, values in (("situacao", situacao), ("categoria_regulatoria", categoria_regulatoria)):
+        valores = resolve_filter_values(query.session, name, values)
+        if valores:
+            query = query.filter(FILTER_COLUMNS[name].in_(valores))
+    for column, name, start, end in (
+        (Medicamento.data_vencimento_registro, "vencimento", vencimento_de, vencimento_ate),
+        (Medicamento.data_finalizacao_processo, "finalizacao", finalizacao_de, finalizacao_ate),
+    ):
+        _check_date_range(name, start, end)
+        if start:
+            query = query.filter(column >= start)
+        if end:
+            query = query.filter(column <= end)
+    return query
+
 
 @router.get("", response_model=MedicamentoListResponse)
 def list_medicamentos(
@@ -19,26 +94,33 @@ def list_medicamentos(
     nome: Optional[str] = None,
     principio_ativo: Optional[str] = None,
     classe_terapeutica: Optional[str] = None,
-    situacao: Optional[str] = None,
-    categoria_regulatoria: Optional[str] = None,
-    db: Session = Depends(get_db),
+    situacao: Optional[list[str]] = Query(None, description="Exact situação, repeatable (e.g. VALIDO)"),
+    categoria_regulatoria: Optional[list[str]] = Query(
+        None, description="Exact categoria regulatória, repeatable (e.g. GENERICO)"
+    ),
+    vencimento_de: Optional[date] = Query(None, description="Registration expiry from (YYYY-MM-DD, inclusive)"),
+    vencimento_ate: Optional[date] = Query(None, description="Registration expiry until (inclusive)"),
+    finalizacao_de: Optional[date] = Query(None, description="Process finalization from (inclusive)"),
+    finalizacao_ate: Optional[date] = Query(None, description="Process finalization until (inclusive)"),
+    db: Session = Depends(get_read_db),
     api_key: str = Depends(get_api_key)
 ):
     """List medicamentos with pagination and filters"""
-    query = db.query(Medicamento)
-    
-    if nome:
-        query = query.filter(Medicamento.nome_produto.ilike(f"%{nome}%"))
-    if principio_ativo:
-        query = query.filter(Medicamento.principio_ativo.ilike(f"%{principio_ativo}%"))
-    if classe_terapeutica:
-        query = query.filter(Medicamento.classe_terapeutica.ilike(f"%{classe_terapeutica}%"))
-    if situacao:
-        query = query.filter(Medicamento.situacao_registro.ilike(f"%{situacao}%"))
-    if categoria_regulatoria:
-        query = query.filter(Medicamento.categoria_regulatoria.ilike(f"%{categoria_regulatoria}%"))
+    query = apply_filters(
+        db.query(Medicamento),
+        nome=nome,
+        principio_ativo=principio_ativo,
+        classe_terapeutica=classe_terapeutica,
+        situacao=situacao,
+        categoria_regulatoria=categoria_regulatoria,
+        vencimento_de=vencimento_de,
+        vencimento_ate=vencimento_ate,
+        finalizacao_de=finalizacao_de,
+        finalizacao_ate=finalizacao_ate,
+    )
     
-    total = query.count()
+    # Text filters can match most of the table: stop counting at COUNT_LIMIT (exact count otherwise)
+    total, total_exact = count_capped(query, None if nome or principio_ativo or classe_terapeutica else 0)
     items = query.offset((page - 1) * limit).limit(limit).all()
     pages = ceil(total / limit) if total > 0 else 0
     
@@ -47,7 +129,173 @@ def list_medicamentos(
         total=total,
         page=page,
         limit=limit,
-        pages=pages
+        pages=pages,
+        total_exact=total_exact
+    )
+
+
+def _stream_export(fmt: str, filters: dict):
+    """
+    Yield the export body in chunks. Uses its own session so the server-side cursor
+    lives exactly as long as the response stream; yield_per keeps a single batch of
+    rows in memory while PostgreSQL streams the rest.
+    """
+    db = new_read_session()
+    try:
+        query = apply_filters(db.query(Medicamento), **filters).order_by(Medicamento.id)
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+        if fmt == "csv":
+            writer.writeheader()
+        for medicamento in query.yield_per(EXPORT_BATCH_SIZE):
+            row = export_row(medicamento)
+            if fmt == "csv":
+                writer.writerow(row)
+            else:
+                buffer.write(json.dumps(row, ensure_ascii=False))
+                buffer.write("\n")
+            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        db.close()
+
+
+@router.get("/export")
+def export_medicamentos(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    nome: Optional[str] = None,
+    principio_ativo: Optional[str] = None,
+    classe_terapeutica: Optional[str] = None,
+    situacao: Optional[list[str]] = Query(None),
+    categoria_regulatoria: Optional[list[str]] = Query(None),
+    vencimento_de: Optional[date] = None,
+    vencimento_ate: Optional[date] = None,
+    finalizacao_de: Optional[date] = None,
+    finalizacao_ate: Optional[date] = None,
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Stream every medicamento (optionally filtered, same filters as the list endpoint)
+    as NDJSON or CSV, without pagination.
+    """
+    filters = dict(
+        nome=nome,
+        principio_ativo=principio_ativo,
+        classe_terapeutica=classe_terapeutica,
+        situacao=situacao,
+        categoria_regulatoria=categoria_regulatoria,
+        vencimento_de=vencimento_de,
+        vencimento_ate=vencimento_ate,
+        finalizacao_de=finalizacao_de,
+        finalizacao_ate=finalizacao_ate,
+    )
+    # Validate before the response starts: errors inside the stream can no longer become a 400
+    for name, value in (("nome", nome), ("principio_ativo", principio_ativo), ("classe_terapeutica", classe_terapeutica)):
+        check_term_length(normalize_search_text(value), name)
+    _check_date_range("vencimento", vencimento_de, vencimento_ate)
+    _check_date_range("finalizacao", finalizacao_de, finalizacao_ate)
+    db = new_read_session()
+    try:
+        for name in ("situacao", "categoria_regulatoria"):
+            resolve_filter_values(db, name, filters[name])
+    finally:
+        db.close()
+    if format == "csv":
+        # Starlette appends "; charset=utf-8" to text/* media types itself
+        media_type = "text/csv"
+    else:
+        media_type = "application/x-ndjson; charset=utf-8"
+    return StreamingResponse(
+        _stream_export(format, filters),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="medicamentos.{format}"'},
+    )
+
+
+def _parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """
+    Parse a single `bytes=start-end` range into inclusive offsets.
+    Returns None for multi-range or malformed headers (served as a full response);
+    raises 416 when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+    start, end = match.group(1), match.group(2)
+    if start:
+        first = int(start)
+        last = min(int(end), size - 1) if end else size - 1
+    else:
+        # Suffix range: last N bytes
+        first = max(size - int(end), 0)
+        last = size - 1
+    if first > last or first >= size:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return first, last
+
+
+def _iter_file_range(path, first: int, last: int):
+    with open(path, "rb") as f:
+        f.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = f.read(min(SNAPSHOT_READ_CHUNK, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@router.get("/snapshot")
+def download_snapshot(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv|parquet)$"),
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Download the precompressed snapshot of the whole dataset generated by the last import.
+    Supports HTTP Range requests; the ETag is the dataset generation.
+    """
+    manifest = read_manifest()
+    path = snapshot_path(manifest, format) if manifest else None
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No {format} snapshot available. Run the import to generate one."
+        )
+
+    etag = f'"{manifest["generation"]}"'
+    size = path.stat().st_size
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{path.name}"',
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    byte_range = _parse_range(range_header, size) if range_header and if_range in (None, etag) else None
+    if byte_range is None:
+        return FileResponse(path, media_type=SNAPSHOT_MEDIA_TYPES[format], headers=headers)
+
+    first, last = byte_range
+    headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+    headers["Content-Length"] = str(last - first + 1)
+    return StreamingResponse(
+        _iter_file_range(path, first, last),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=SNAPSHOT_MEDIA_TYPES[format],
+        headers=headers,
     )
 
 
@@ -56,21 +304,83 @@ def search_medicamentos(
     q: str = Query(..., min_length=1, description="Search term"),
     page: int = Query(1, ge=1),
     limit: int = Query(50, ge=1, le=100),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     api_key: str = Depends(get_api_key)
 ):
-    """Search medicamentos by name or principio ativo"""
-    query = db.query(Medicamento).filter(
-        or_(
-            Medicamento.nome_produto.ilike(f"%{q}%"),
-            Medicamento.principio_ativo.ilike(f"%{q}%")
+    """Search medicamentos by name or principio ativo (accent- and case-insensitive)"""
+    term = normalize_search_text(q)
+    if not term:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Search term is empty"
         )
+    check_term_length(term, "Search term")
+    query = db.query(Medicamento).filter(
+        contains_filter(db, [Medicamento.nome_produto_busca, Medicamento.principio_ativo_busca], term)
     )
     
-    total = query.count()
+    total, total_exact = count_capped(query)
     items = query.offset((page - 1) * limit).limit(limit).all()
     pages = ceil(total / limit) if total > 0 else 0
     
+    return MedicamentoListResponse(
+        items=items,
+        total=total,
+        page=page,
+        limit=limit,
+        pages=pages,
+        total_exact=total_exact
+    )
+
+
+@router.get("/autocomplete", response_model=AutocompleteResponse)
+def autocomplete_medicamentos(
+    prefix: str = Query(..., min_length=1, max_length=100, description="What the user typed so far"),
+    limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS),
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Product names and active ingredients starting with `prefix` (accent- and
+    case-insensitive), most common first. Served from memory, no query per keystroke.
+    """
+    term = normalize_search_text(prefix)
+    if not term:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Prefix is empty"
+        )
+    index = autocomplete.get_index()
+    return AutocompleteResponse(
+        prefix=term,
+        generation=index.generation,
+        items=[AutocompleteItem(**suggestion._asdict()) for suggestion in index.search(term, limit)],
+    )
+
+
+@router.get("/vencendo", response_model=MedicamentoListResponse)
+def list_medicamentos_vencendo(
+    dias: int = Query(90, ge=0, le=3650, description="Registrations expiring between today and today + dias"),
+    page: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    api_key: str = Depends(get_api_key)
+):
+    """List medicamentos whose registration expires within `dias` days, soonest first (index range scan)"""
+    today = date.today()
+    query = db.query(Medicamento).filter(
+        Medicamento.data_vencimento_registro >= today,
+        Medicamento.data_vencimento_registro <= today + timedelta(days=dias),
+    )
+
+    total, _ = count_capped(query, 0)
+    items = (
+        query.order_by(Medicamento.data_vencimento_registro, Medicamento.id)
+        .offset((page - 1) * limit)
+        .limit(limit)
+        .all()
+    )
+    pages = ceil(total / limit) if total > 0 else 0
+
     return MedicamentoListResponse(
         items=items,
         total=total,
@@ -80,10 +390,72 @@ def search_medicamentos(
     )
 
 
+@router.get("/changes", response_model=AlteracoesResponse)
+def list_changes(
+    since: int = Query(..., ge=0, description="Last generation the client has (0 for everything)"),
+    cursor: Optional[int] = Query(None, ge=0, description="next_cursor of the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_read_db),
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Registrations added, modified or removed by the imports after generation `since`,
+    oldest first, with their current rows (keyset pagination on the change id)
+    """
+    generation = db.query(func.max(DatasetGeneration.id)).scalar()
+    query = db.query(MedicamentoAlteracao).filter(MedicamentoAlteracao.generation_id <= (generation or 0))
+    if cursor is None:
+        # Change ids grow with the generation: start right before the first change after `since`
+        first = (
+            query.with_entities(MedicamentoAlteracao.id)
+            .filter(MedicamentoAlteracao.generation_id > since)
+            .order_by(MedicamentoAlteracao.generation_id, MedicamentoAlteracao.id)
+            .first()
+        )
+        cursor = first.id - 1 if first else None
+    changes = []
+    if cursor is not None:
+        changes = (
+            query.filter(MedicamentoAlteracao.id > cursor)
+            .order_by(MedicamentoAlteracao.id)
+            .limit(limit + 1)
+            .all()
+        )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    rows = {}
+    numeros = {change.numero_registro_produto for change in changes if change.tipo != "removed"}
+    if numeros:
+        for medicamento in (
+            db.query(Medicamento)
+            .filter(Medicamento.numero_registro_produto.in_(numeros))
+            .order_by(Medicamento.id)
+        ):
+            rows.setdefault(medicamento.numero_registro_produto, []).append(medicamento)
+
+    return AlteracoesResponse(
+        since=since,
+        generation=generation,
+        items=[
+            AlteracaoResponse(
+                id=change.id,
+                generation=change.generation_id,
+                numero_registro_produto=change.numero_registro_produto,
+                tipo=change.tipo,
+                medicamentos=rows.get(change.numero_registro_produto, []) if change.tipo != "removed" else [],
+            )
+            for change in changes
+        ],
+        limit=limit,
+        next_cursor=changes[-1].id if has_more else None
+    )
+
+
 @router.get("/{medicamento_id}", response_model=MedicamentoResponse)
 def get_medicamento(
     medicamento_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     api_key: str = Depends(get_api_key)
 ):
     """Get medicamento by ID"""
@@ -94,3 +466,68 @@ def get_medicamento(
             detail="Medicamento not found"
         )
     return medicamento
+
+
+@router.get("/{medicamento_id}/equivalentes", response_model=EquivalentesResponse)
+def list_equivalentes(
+    medicamento_id: int,
+    categoria: Optional[str] = Query(None, description="Only this categoria_regulatoria (e.g. Genérico, Similar)"),
+    page: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    api_key: str = Depends(get_api_key)
+):
+    """
+    Other medicamentos with exactly the same active ingredients, per categoria_regulatoria
+    (precomputed equivalence group: an index lookup on grupo_equivalencia_id)
+    """
+    medicamento = db.query(Medicamento).filter(Medicamento.id == medicamento_id).first()
+    if not medicamento:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Medicamento not found"
+        )
+    if medicamento.grupo_equivalencia_id is None:
+        return EquivalentesResponse(
+            medicamento_id=medicamento_id, categoria=categoria, por_categoria={},
+            items=[], total=0, page=page, limit=limit, pages=0
+        )
+
+    grupo = db.query(GrupoEquivalencia).filter(GrupoEquivalencia.id == medicamento.grupo_equivalencia_id).first()
+    query = db.query(Medicamento).filter(
+        Medicamento.grupo_equivalencia_id == medicamento.grupo_equivalencia_id,
+        Medicamento.id != medicamento_id,
+    )
+    por_categoria = dict(
+        query.with_entities(Medicamento.categoria_regulatoria, func.count())
+        .filter(Medicamento.categoria_regulatoria.isnot(None))
+        .group_by(Medicamento.categoria_regulatoria)
+        .all()
+    )
+
+    if categoria is not None:
+        # Match the stored spelling regardless of case and accents (GENERICO -> Genérico)
+        wanted = normalize_search_text(categoria)
+        matches = [value for value in por_categoria if normalize_search_text(value) == wanted]
+        categoria = matches[0] if matches else categoria
+        query = query.filter(Medicamento.categoria_regulatoria == categoria)
+        total = por_categoria.get(categoria, 0)
+        query = query.order_by(Medicamento.id)
+    else:
+        total = query.count()
+        query = query.order_by(Medicamento.categoria_regulatoria, Medicamento.id)
+
+    items = query.offset((page - 1) * limit).limit(limit).all()
+    pages = ceil(total / limit) if total > 0 else 0
+
+    return EquivalentesResponse(
+        medicamento_id=medicamento_id,
+        grupo=grupo,
+        categoria=categoria,
+        por_categoria=por_categoria,
+        items=items,
+        total=total,
+        page=page,
+        limit=limit,
+        pages=pages
+    )
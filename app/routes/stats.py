@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
-from app.database import get_db
+from app.database import get_read_db
 from app.models import Medicamento
 from app.schemas import StatsResponse
 from app.auth import get_api_key
@@ -12,7 +12,7 @@ router = APIRouter(prefix="/stats", tags=["stats"])
 
 @router.get("", response_model=StatsResponse)
 def get_stats(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     api_key: str = Depends(get_api_key)
 ):
     """Get statistics about medicamentos"""
@@ -0,0 +1,90 @@
+from fastapi import APIRouter, Depends, Query, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import Optional
+from math import ceil
+
+from app.database import get_read_db
+from app.models import Medicamento, PrincipioAtivo, medicamento_principios
+from app.schemas import MedicamentoListResponse, SubstanciaListResponse, SubstanciaResponse
+from app.auth import get_api_key
+from app.text import LIKE_ESCAPE, normalize_search_text, prefix_pattern
+
+router = APIRouter(prefix="/substancias", tags=["substancias"])
+
+
+@router.get("", response_model=SubstanciaListResponse)
+def list_substancias(
+    q: Optional[str] = Query(None, description="Name prefix (accent- and case-insensitive)"),
+    page: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    api_key: str = Depends(get_api_key)
+):
+    """List active ingredients (substâncias), optionally filtered by name prefix"""
+    query = db.query(PrincipioAtivo)
+    term = normalize_search_text(q)
+    if term:
+        query = query.filter(PrincipioAtivo.nome_busca.like(prefix_pattern(term), escape=LIKE_ESCAPE))
+
+    total = query.count()
+    items = query.order_by(PrincipioAtivo.nome_busca).offset((page - 1) * limit).limit(limit).all()
+    pages = ceil(total / limit) if total > 0 else 0
+
+    return SubstanciaListResponse(
+        items=items,
+        total=total,
+        page=page,
+        limit=limit,
+        pages=pages
+    )
+
+
+@router.get("/{substancia_id}", response_model=SubstanciaResponse)
+def get_substancia(
+    substancia_id: int,
+    db: Session = Depends(get_read_db),
+    api_key: str = Depends(get_api_key)
+):
+    """Get active ingredient by ID"""
+    substancia = db.query(PrincipioAtivo).filter(PrincipioAtivo.id == substancia_id).first()
+    if not substancia:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Substância not found"
+        )
+    return substancia
+
+
+@router.get("/{substancia_id}/medicamentos", response_model=MedicamentoListResponse)
+def list_medicamentos_por_substancia(
+    substancia_id: int,
+    page: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    api_key: str = Depends(get_api_key)
+):
+    """List medicamentos containing the active ingredient (indexed join)"""
+    substancia = db.query(PrincipioAtivo).filter(PrincipioAtivo.id == substancia_id).first()
+    if not substancia:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Substância not found"
+        )
+
+    query = (
+        db.query(Medicamento)
+        .join(medicamento_principios, medicamento_principios.c.medicamento_id == Medicamento.id)
+        .filter(medicamento_principios.c.principio_ativo_id == substancia_id)
+    )
+    # Maintained by the importer: avoids a COUNT over the join
+    total = substancia.total_medicamentos
+    items = query.order_by(Medicamento.id).offset((page - 1) * limit).limit(limit).all()
+    pages = ceil(total / limit) if total > 0 else 0
+
+    return MedicamentoListResponse(
+        items=items,
+        total=total,
+        page=page,
+        limit=limit,
+        pages=pages
+    )
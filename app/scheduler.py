@@ -0,0 +1,93 @@
+"""
+In-app dataset refresh, replacing the external cron on /admin/import.
+
+Every worker runs the loop (REFRESH_INTERVAL plus a random 0..REFRESH_JITTER
+delay, so workers started together do not fire together); on each tick the
+worker that wins pg_try_advisory_lock on the import lock is the leader for
+that run, the others skip it. The same lock guards the CLI and upload imports,
+so a scheduled refresh never overlaps a manual one.
+
+The leader sends a HEAD request to the source and imports only when its version
+(ETag, else Last-Modified and size) differs from the one recorded with the
+latest generation. A source that sends neither is imported at most once per
+REFRESH_INTERVAL, not once per worker tick. The import, derived tables included,
+runs in one transaction (atomic=True), so requests served meanwhile never see a
+partial catalogue, and ends with a NOTIFY that the other workers act on (app.generations).
+"""
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from app.database import SessionLocal, settings
+from app.models import DatasetGeneration
+from scripts.import_csv import DEFAULT_CSV_URL, fetch_source_version, import_csv, import_lock
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshScheduler:
+    def __init__(self, interval: float, jitter: float, source_url: str):
+        self.interval = interval
+        self.jitter = jitter
+        self.source_url = source_url
+        self._task: Optional[asyncio.Task] = None
+
+    def next_delay(self) -> float:
+        return self.interval + random.uniform(0, max(self.jitter, 0))
+
+    def run_once(self) -> Optional[int]:
+        """One refresh attempt: the new generation id, or None when skipped or unchanged"""
+        with import_lock() as acquired:
+            if not acquired:
+                logger.info("Scheduled refresh skipped: another import is running")
+                return None
+            version = fetch_source_version(self.source_url)
+            db = SessionLocal()
+            try:
+                latest = db.query(DatasetGeneration).order_by(DatasetGeneration.id.desc()).first()
+            finally:
+                db.close()
+            if latest is not None and latest.source == self.source_url:
+                if version is not None and latest.source_version == version:
+                    logger.info("Scheduled refresh: source unchanged (%s)", version)
+                    return None
+                # No version to compare: another worker's tick in this interval already imported
+                recent = datetime.now(timezone.utc) - timedelta(seconds=self.interval)
+                if version is None and latest.created_at is not None and latest.created_at > recent:
+                    logger.info("Scheduled refresh: source has no version, last imported at %s", latest.created_at)
+                    return None
+            logger.info("Scheduled refresh: importing %s (version %s)", self.source_url, version)
+            generation = import_csv(self.source_url, source_version=version, take_lock=False, atomic=True)
+            return generation.id if generation else None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.next_delay())
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception:
+                logger.exception("Scheduled refresh failed")
+
+    def start(self) -> None:
+        """Start the loop on the running event loop (no-op when REFRESH_INTERVAL is 0)"""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+refresh_scheduler = RefreshScheduler(
+    settings.refresh_interval,
+    settings.refresh_jitter,
+    settings.refresh_source_url or DEFAULT_CSV_URL,
+)
@@ -13,6 +13,7 @@ class MedicamentoBase(BaseModel):
     numero_processo: Optional[str] = None
     classe_terapeutica: Optional[str] = None
     empresa_detentora_registro: Optional[str] = None
+    empresa_cnpj: Optional[str] = None
     situacao_registro: Optional[str] = None
     principio_ativo: Optional[str] = None
 
@@ -36,6 +37,96 @@ class MedicamentoListResponse(BaseModel):
     page: int
     limit: int
     pages: int
+    # False when counting stopped at COUNT_LIMIT: `total` is then a lower bound
+    total_exact: bool = True
+
+
+class AutocompleteItem(BaseModel):
+    nome: str
+    tipo: str
+    total_medicamentos: int
+
+
+class AutocompleteResponse(BaseModel):
+    prefix: str
+    generation: Optional[int] = None
+    items: list[AutocompleteItem]
+
+
+class SubstanciaResponse(BaseModel):
+    id: int
+    nome: str
+    total_medicamentos: int
+
+    class Config:
+        from_attributes = True
+
+
+class SubstanciaListResponse(BaseModel):
+    items: list[SubstanciaResponse]
+    total: int
+    page: int
+    limit: int
+    pages: int
+
+
+class EmpresaResponse(BaseModel):
+    cnpj: str
+    razao_social: str
+    total_medicamentos: int
+
+    class Config:
+        from_attributes = True
+
+
+class EmpresaListResponse(BaseModel):
+    items: list[EmpresaResponse]
+    total: int
+    page: int
+    limit: int
+    pages: int
+
+
+class GrupoEquivalenciaResponse(BaseModel):
+    id: int
+    nome: str
+    total_medicamentos: int
+
+    class Config:
+        from_attributes = True
+
+
+class EquivalentesResponse(BaseModel):
+    medicamento_id: int
+    # None when the medicamento has no active ingredients on record
+    grupo: Optional[GrupoEquivalenciaResponse] = None
+    categoria: Optional[str] = None
+    # Other medicamentos of the group per categoria_regulatoria
+    por_categoria: dict[str, int]
+    items: list[MedicamentoResponse]
+    total: int
+    page: int
+    limit: int
+    pages: int
+
+
+class AlteracaoResponse(BaseModel):
+    id: int
+    generation: int
+    numero_registro_produto: str
+    tipo: str  # "added", "modified" or "removed"
+    # Current rows of the registration (empty once it is removed)
+    medicamentos: list[MedicamentoResponse]
+
+
+class AlteracoesResponse(BaseModel):
+    since: int
+    # Latest generation covered: the next `since` once next_cursor is None
+    generation: Optional[int] = None
+    items: list[AlteracaoResponse]
+    limit: int
+    # Pass as `cursor` for the next page; None on the last page
+    next_cursor: Optional[int] = None
 
 
 class APIKeyCreate(BaseModel):
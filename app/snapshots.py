@@ -0,0 +1,268 @@
+"""
+Precompressed dataset snapshots (gzip NDJSON/CSV, optionally Parquet).
+Written by scripts/import_csv.py after a successful load and served as static
+files by /medicamentos/snapshot, so full-catalogue downloads skip the database.
+
+The same import also writes a read-only SQLite copy of the catalogue tables with
+an FTS5 trigram index, served by READ_BACKEND=sqlite replicas (app.sqlite_backend).
+"""
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import sqlite3
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.database import Base, settings
+from app.models import (
+    DatasetGeneration, Empresa, GrupoEquivalencia, Medicamento, MedicamentoAlteracao, PrincipioAtivo,
+    ValorFiltro, medicamento_principios,
+)
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+# Generations kept on disk (the current one plus the previous, for in-flight downloads)
+KEEP_GENERATIONS = 2
+SNAPSHOT_BATCH_SIZE = 1000
+
+# Catalogue tables copied into the SQLite snapshot (parents first); API keys stay in PostgreSQL
+SQLITE_TABLES = [
+    DatasetGeneration.__table__,
+    MedicamentoAlteracao.__table__,
+    Empresa.__table__,
+    PrincipioAtivo.__table__,
+    GrupoEquivalencia.__table__,
+    Medicamento.__table__,
+    ValorFiltro.__table__,
+    medicamento_principios,
+]
+# External-content FTS5 index over the normalized text columns; the trigram
+# tokenizer (SQLite >= 3.34) answers substring matches like LIKE '%term%'
+FTS_TABLE = "medicamentos_fts"
+FTS_COLUMNS = ["nome_produto_busca", "principio_ativo_busca", "classe_terapeutica_busca"]
+
+EXPORT_FIELDS = [
+    "id",
+    "tipo_produto",
+    "nome_produto",
+    "data_finalizacao_processo",
+    "categoria_regulatoria",
+    "numero_registro_produto",
+    "data_vencimento_registro",
+    "numero_processo",
+    "classe_terapeutica",
+    "empresa_detentora_registro",
+    "situacao_registro",
+    "principio_ativo",
+]
+
+SNAPSHOT_MEDIA_TYPES = {
+    "ndjson": "application/gzip",
+    "csv": "application/gzip",
+    "parquet": "application/vnd.apache.parquet",
+    "sqlite": "application/vnd.sqlite3",
+}
+
+
+def export_row(medicamento: Medicamento) -> dict:
+    """Plain dict of the exported fields (dates as ISO strings)"""
+    row = {}
+    for field in EXPORT_FIELDS:
+        value = getattr(medicamento, field)
+        row[field] = value.isoformat() if hasattr(value, "isoformat") else value
+    return row
+
+
+def snapshot_filename(generation: int, fmt: str) -> str:
+    suffix = fmt if fmt in ("parquet", "sqlite") else f"{fmt}.gz"
+    return f"medicamentos-{generation}.{suffix}"
+
+
+def _parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _fts5_trigram_available() -> bool:
+    try:
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute("CREATE VIRTUAL TABLE t USING fts5(a, tokenize='trigram')")
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+    return True
+
+
+def _gzip_writer(fileobj, name: str) -> gzip.GzipFile:
+    """
+    Gzip stream into `fileobj` (left open on close) whose header names the published
+    file: gunzip -N restores `name` minus .gz, not the temporary path. mtime=0 keeps
+    the output byte-identical for identical data.
+    """
+    return gzip.GzipFile(filename=name, mode="wb", fileobj=fileobj, mtime=0)
+
+
+def write_sqlite_snapshot(db: Session, path: Path) -> None:
+    """
+    Copy the catalogue tables into a new SQLite file at `path`, build the FTS5 index
+    and compact the file. The file is never modified afterwards (readers open it immutable).
+    """
+    if path.exists():
+        path.unlink()
+    sqlite_engine = create_engine(f"sqlite:///{path}")
+    try:
+        with sqlite_engine.connect() as conn:
+            # Throwaway file until published: no journal, no fsync
+            conn.exec_driver_sql("PRAGMA journal_mode=OFF")
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+            Base.metadata.create_all(conn, tables=SQLITE_TABLES)
+            for table in SQLITE_TABLES:
+                result = db.execute(select(table).execution_options(yield_per=SNAPSHOT_BATCH_SIZE))
+                for rows in result.mappings().partitions():
+                    conn.execute(table.insert(), [dict(row) for row in rows])
+            conn.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({', '.join(FTS_COLUMNS)}, "
+                f"content='{Medicamento.__tablename__}', content_rowid='id', tokenize='trigram')"
+            )
+            conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+            conn.exec_driver_sql("ANALYZE")
+            conn.commit()
+            conn.exec_driver_sql("VACUUM")
+    finally:
+        sqlite_engine.dispose()
+
+
+def write_snapshots(db: Session, generation: int, snapshot_dir: Optional[str] = None) -> dict:
+    """
+    Write the snapshot files for `generation` in a single pass over the table and
+    publish them by atomically replacing the manifest. Returns the manifest.
+    """
+    directory = Path(snapshot_dir or settings.snapshot_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    formats = ["ndjson", "csv"]
+    if settings.snapshot_parquet:
+        if _parquet_available():
+            formats.append("parquet")
+        else:
+            logger.warning("SNAPSHOT_PARQUET is set but pyarrow is not installed; skipping Parquet snapshot")
+    write_sqlite = settings.snapshot_sqlite
+    if write_sqlite and not _fts5_trigram_available():
+        logger.warning("This SQLite build lacks the FTS5 trigram tokenizer; skipping SQLite snapshot")
+        write_sqlite = False
+
+    tmp_paths = {fmt: directory / (snapshot_filename(generation, fmt) + ".tmp") for fmt in formats}
+    if write_sqlite:
+        tmp_paths["sqlite"] = directory / (snapshot_filename(generation, "sqlite") + ".tmp")
+    manifest_tmp = directory / (MANIFEST_NAME + ".tmp")
+    try:
+        ndjson_file = open(tmp_paths["ndjson"], "wb")
+        csv_file = open(tmp_paths["csv"], "wb")
+        ndjson_out = _gzip_writer(ndjson_file, snapshot_filename(generation, "ndjson"))
+        csv_out = _gzip_writer(csv_file, snapshot_filename(generation, "csv"))
+        ndjson_text = io.TextIOWrapper(ndjson_out, encoding="utf-8", newline="")
+        csv_text = io.TextIOWrapper(csv_out, encoding="utf-8", newline="")
+        csv_writer = csv.DictWriter(csv_text, fieldnames=EXPORT_FIELDS)
+        csv_writer.writeheader()
+
+        parquet_writer = None
+        parquet_batch = []
+        if "parquet" in formats:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            schema = pa.schema([(field, pa.int64() if field == "id" else pa.string()) for field in EXPORT_FIELDS])
+            parquet_writer = pq.ParquetWriter(str(tmp_paths["parquet"]), schema, compression="zstd")
+
+        row_count = 0
+        try:
+            query = db.query(Medicamento).order_by(Medicamento.id)
+            for medicamento in query.yield_per(SNAPSHOT_BATCH_SIZE):
+                row = export_row(medicamento)
+                ndjson_text.write(json.dumps(row, ensure_ascii=False))
+                ndjson_text.write("\n")
+                csv_writer.writerow(row)
+                row_count += 1
+                if parquet_writer is not None:
+                    parquet_batch.append(row)
+                    if len(parquet_batch) >= SNAPSHOT_BATCH_SIZE:
+                        parquet_writer.write_table(pa.Table.from_pylist(parquet_batch, schema=schema))
+                        parquet_batch = []
+            if parquet_writer is not None and parquet_batch:
+                parquet_writer.write_table(pa.Table.from_pylist(parquet_batch, schema=schema))
+        finally:
+            ndjson_text.close()
+            csv_text.close()
+            ndjson_file.close()
+            csv_file.close()
+            if parquet_writer is not None:
+                parquet_writer.close()
+
+        if write_sqlite:
+            write_sqlite_snapshot(db, tmp_paths["sqlite"])
+
+        files = {}
+        for fmt, tmp_path in tmp_paths.items():
+            final_path = directory / snapshot_filename(generation, fmt)
+            os.replace(tmp_path, final_path)
+            files[fmt] = {"name": final_path.name, "size": final_path.stat().st_size}
+
+        manifest = {"generation": generation, "row_count": row_count, "files": files}
+        manifest_tmp.write_text(json.dumps(manifest), encoding="utf-8")
+        os.replace(manifest_tmp, directory / MANIFEST_NAME)
+    except BaseException:
+        # Full-catalogue-sized leftovers: a failed import must not leave them behind
+        for tmp_path in (*tmp_paths.values(), manifest_tmp):
+            tmp_path.unlink(missing_ok=True)
+        raise
+
+    _prune_old_generations(directory, generation)
+    return manifest
+
+
+def _prune_old_generations(directory: Path, current: int) -> None:
+    """Delete snapshot files older than the last KEEP_GENERATIONS generations"""
+    for path in directory.glob("medicamentos-*"):
+        generation = path.name.split("-", 1)[1].split(".", 1)[0]
+        if generation.isdigit() and int(generation) <= current - KEEP_GENERATIONS:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+_manifest_cache: dict = {"mtime": None, "manifest": None}
+
+
+def read_manifest() -> Optional[dict]:
+    """Current snapshot manifest (re-read only when the file changes), or None"""
+    path = Path(settings.snapshot_dir) / MANIFEST_NAME
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    if _manifest_cache["mtime"] != mtime:
+        _manifest_cache["manifest"] = json.loads(path.read_text(encoding="utf-8"))
+        _manifest_cache["mtime"] = mtime
+    return _manifest_cache["manifest"]
+
+
+def snapshot_path(manifest: dict, fmt: str) -> Optional[Path]:
+    entry = manifest.get("files", {}).get(fmt)
+    if not entry:
+        return None
+    path = Path(settings.snapshot_dir) / entry["name"]
+    return path if path.exists() else None
@@ -0,0 +1,122 @@
+"""
+Read-only SQLite backend (READ_BACKEND=sqlite) for catalogue replicas that should
+not hold PostgreSQL connections for reads.
+
+The import writes medicamentos-<generation>.sqlite next to the other snapshots
+(app.snapshots). Read sessions open the file of the current manifest as an
+immutable, memory-mapped database: pages come straight from the OS page cache,
+shared by every connection and worker. When the manifest names a new
+generation, the next read opens the new file and the previous engine is
+disposed (sessions already running finish on it).
+
+Text filters use the FTS5 trigram index of the snapshot (see contains_filter),
+the rest of the queries are the same ORM queries that run on PostgreSQL.
+"""
+import logging
+import threading
+import time
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import create_engine, event, literal_column, or_, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql import column, table
+
+from app.database import settings
+from app.models import Medicamento
+from app.profiling import install_query_hooks
+from app.snapshots import FTS_TABLE, read_manifest, snapshot_path
+from app.text import LIKE_ESCAPE, contains_pattern
+
+logger = logging.getLogger(__name__)
+
+# The trigram tokenizer cannot match shorter terms: those fall back to LIKE
+FTS_MIN_TERM_LENGTH = 3
+
+_fts = table(FTS_TABLE, column("rowid"))
+
+
+def contains_filter(db: Session, columns: list, term: str):
+    """
+    WHERE clause for a normalized `term` anywhere in any of the Medicamento *_busca
+    `columns`: an FTS5 MATCH on a SQLite snapshot, LIKE (trigram-indexed) on PostgreSQL.
+    """
+    if db.get_bind().dialect.name != "sqlite" or len(term) < FTS_MIN_TERM_LENGTH:
+        pattern = contains_pattern(term)
+        return or_(*(col.like(pattern, escape=LIKE_ESCAPE) for col in columns))
+    # {col1 col2} : "phrase" -> the phrase as a substring of any of the columns
+    phrase = '"' + term.replace('"', '""') + '"'
+    match = f"{{{' '.join(col.key for col in columns)}}} : {phrase}"
+    return Medicamento.id.in_(select(_fts.c.rowid).where(literal_column(FTS_TABLE).op("MATCH")(match)))
+
+
+def _create_snapshot_engine(path) -> Engine:
+    snapshot_engine = create_engine(
+        f"sqlite:///file:{path}?mode=ro&immutable=1&uri=true",
+        connect_args={"check_same_thread": False},
+    )
+
+    @event.listens_for(snapshot_engine, "connect")
+    def _configure(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        cursor.execute("PRAGMA query_only=1")
+        cursor.close()
+
+    install_query_hooks(snapshot_engine)
+    return snapshot_engine
+
+
+class SqliteSnapshot:
+    """
+    The engine of the current SQLite snapshot. At most one manifest check every
+    `check_interval` seconds; the swap happens in one thread while the others keep
+    using the previous engine.
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self.generation: Optional[int] = None
+        self.engine: Optional[Engine] = None
+        self._sessionmaker: Optional[sessionmaker] = None
+        self._checked_at = time.monotonic() - self.check_interval
+        self._lock = threading.Lock()
+
+    def session(self) -> Session:
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            # Nothing to serve yet: wait for the check instead of failing
+            if self._lock.acquire(blocking=self._sessionmaker is None):
+                try:
+                    self.refresh()
+                finally:
+                    self._lock.release()
+        factory = self._sessionmaker
+        if factory is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="No SQLite snapshot available yet. Run the import to generate one."
+            )
+        return factory()
+
+    def invalidate(self) -> None:
+        """Re-read the manifest on the next session (a new generation was announced)"""
+        self._checked_at = time.monotonic() - self.check_interval
+
+    def refresh(self) -> None:
+        manifest = read_manifest()
+        path = snapshot_path(manifest, "sqlite") if manifest else None
+        self._checked_at = time.monotonic()
+        if path is None or manifest["generation"] == self.generation:
+            return
+        previous = self.engine
+        self.engine = _create_snapshot_engine(path)
+        self._sessionmaker = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.generation = manifest["generation"]
+        logger.info("Serving reads from SQLite snapshot %s (generation %s)", path.name, self.generation)
+        if previous is not None:
+            # Closes the idle connections; checked-out ones are closed when returned
+            previous.dispose()
+
+
+sqlite_snapshot = SqliteSnapshot(settings.sqlite_check_interval)
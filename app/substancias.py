@@ -0,0 +1,94 @@
+"""
+Active-ingredient dimension: splits the free-text principio_ativo of each
+medicamento into principios_ativos rows plus medicamento_principios links, so
+"every product containing X" is an indexed join instead of a wildcard scan.
+Built by the importer after the medicamentos are loaded.
+"""
+import re
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import Medicamento, PrincipioAtivo, medicamento_principios
+from app.text import normalize_search_text
+
+# "PARACETAMOL + CAFEÍNA", "A; B", "A, B" (a comma followed by a space; "2,4-D" stays whole)
+SEPARATOR_RE = re.compile(r"\s*[+;]\s*|,\s+")
+BUILD_BATCH_SIZE = 5000
+
+
+def split_principio_ativo(value: Optional[str]) -> list[str]:
+    """Distinct substance names in a principio_ativo string, in order of appearance"""
+    if not value:
+        return []
+    seen = set()
+    parts = []
+    for part in SEPARATOR_RE.split(value):
+        part = part.strip()
+        key = normalize_search_text(part)
+        if key and key not in seen:
+            seen.add(key)
+            parts.append(part)
+    return parts
+
+
+def _ensure_substancias(db: Session, names: dict[str, str], ids: dict[str, int]) -> None:
+    """Insert substances missing from `ids` (normalized key -> display name) and record their ids"""
+    missing = [{"nome": nome, "nome_busca": key} for key, nome in names.items() if key not in ids]
+    if not missing:
+        return
+    table = PrincipioAtivo.__table__
+    db.execute(insert(table).values(missing).on_conflict_do_nothing(index_elements=[table.c.nome_busca]))
+    keys = [row["nome_busca"] for row in missing]
+    for key, substancia_id in db.execute(select(table.c.nome_busca, table.c.id).where(table.c.nome_busca.in_(keys))):
+        ids[key] = substancia_id
+
+
+def build_substancias(db: Session) -> int:
+    """
+    Rebuild medicamento_principios from the loaded medicamentos, reusing existing
+    substance ids, and refresh the per-substance product counts. Returns the link count.
+    Does not commit: the importer commits it with the dataset generation.
+    """
+    ids = dict(db.execute(select(PrincipioAtivo.nome_busca, PrincipioAtivo.id)).all())
+    db.execute(medicamento_principios.delete())
+    links = 0
+
+    def flush(batch: list[tuple[int, list[str]]]) -> int:
+        names = {}
+        for _, parts in batch:
+            for part in parts:
+                names.setdefault(normalize_search_text(part), part)
+        _ensure_substancias(db, names, ids)
+        rows = [
+            {"medicamento_id": medicamento_id, "principio_ativo_id": ids[normalize_search_text(part)]}
+            for medicamento_id, parts in batch
+            for part in parts
+        ]
+        if rows:
+            db.execute(medicamento_principios.insert(), rows)
+        return len(rows)
+
+    batch = []
+    query = db.query(Medicamento.id, Medicamento.principio_ativo).filter(Medicamento.principio_ativo.isnot(None))
+    # Server-side cursor in the session's own transaction: it sees medicamentos not committed yet
+    result = db.execute(query.statement, execution_options={"yield_per": BUILD_BATCH_SIZE})
+    for medicamento_id, principio_ativo in result:
+        parts = split_principio_ativo(principio_ativo)
+        if parts:
+            batch.append((medicamento_id, parts))
+        if len(batch) >= BUILD_BATCH_SIZE:
+            links += flush(batch)
+            batch = []
+    links += flush(batch)
+
+    counts = (
+        select(func.count())
+        .select_from(medicamento_principios)
+        .where(medicamento_principios.c.principio_ativo_id == PrincipioAtivo.id)
+        .scalar_subquery()
+    )
+    db.execute(update(PrincipioAtivo).values(total_medicamentos=counts))
+    return links
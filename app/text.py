@@ -0,0 +1,36 @@
+"""
+Text normalization for accent- and case-insensitive search.
+The importer stores normalized copies of the searchable columns (*_busca) and
+queries normalize user input the same way, so no function runs per row at query time.
+"""
+import re
+import unicodedata
+from typing import Optional
+
+_WHITESPACE_RE = re.compile(r"\s+")
+LIKE_ESCAPE = "\\"
+
+
+def normalize_search_text(value: Optional[str]) -> Optional[str]:
+    """'  Dipirona  SÓDICA ' -> 'dipirona sodica' (accents removed, lowercase, whitespace collapsed)"""
+    if not value:
+        return None
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    normalized = _WHITESPACE_RE.sub(" ", stripped.lower()).strip()
+    return normalized or None
+
+
+def escape_like(term: str) -> str:
+    """Escape LIKE wildcards in user input (use with escape=LIKE_ESCAPE)"""
+    return term.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2).replace("%", LIKE_ESCAPE + "%").replace("_", LIKE_ESCAPE + "_")
+
+
+def contains_pattern(term: str) -> str:
+    """LIKE pattern matching `term` anywhere"""
+    return f"%{escape_like(term)}%"
+
+
+def prefix_pattern(term: str) -> str:
+    """LIKE pattern matching values starting with `term`"""
+    return f"{escape_like(term)}%"
@@ -0,0 +1,88 @@
+"""
+Per-request Server-Timing breakdown.
+
+For a SERVER_TIMING_SAMPLE_RATE share of requests, RequestContextMiddleware puts a
+RequestTimings in a ContextVar (it reaches the threadpool too) and writes the
+collected spans as a Server-Timing header:
+
+  auth           get_api_key (key lookup, quota accounting)
+  db             SQL outside the other spans (from the app.profiling query hooks)
+  count          total/pages counts
+  serialization  response model validation and serialization
+  total          until the response headers are sent
+
+Unsampled requests pay one ContextVar lookup per instrumented point.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+SPANS = ("auth", "db", "count", "serialization")
+
+
+class RequestTimings:
+    def __init__(self):
+        self.durations_ms = dict.fromkeys(SPANS, 0.0)
+        self.db_statements = 0
+        self._open_spans = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str):
+        started = time.perf_counter()
+        with self._lock:
+            self._open_spans += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._open_spans -= 1
+                self.durations_ms[name] += (time.perf_counter() - started) * 1000
+
+    def add_statement(self, elapsed_ms: float) -> None:
+        """SQL time counts as `db` unless it runs inside another span (auth, count)"""
+        with self._lock:
+            if not self._open_spans:
+                self.db_statements += 1
+                self.durations_ms["db"] += elapsed_ms
+
+    def header(self, total_ms: float) -> str:
+        parts = []
+        for name, elapsed_ms in self.durations_ms.items():
+            if name == "db":
+                parts.append(f'db;dur={elapsed_ms:.2f};desc="{self.db_statements} queries"')
+            elif elapsed_ms:
+                parts.append(f"{name};dur={elapsed_ms:.2f}")
+        parts.append(f"total;dur={total_ms:.2f}")
+        return ", ".join(parts)
+
+
+_current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("current_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current_timings.get()
+
+
+@contextmanager
+def collect_request_timings():
+    """Collect spans for the request running in this context (used by the middleware)"""
+    timings = RequestTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+@contextmanager
+def timing_span(name: str):
+    """Time a block into the current request's Server-Timing (no-op for unsampled requests)"""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    with timings.span(name):
+        yield
@@ -0,0 +1,106 @@
+"""
+Streaming request bodies for uploads: yields the bytes of the uploaded file as they
+arrive, from either a multipart/form-data body (the part named `field_name`) or a
+raw body (text/csv, application/octet-stream,
+chunked transfer encoding). Nothing is buffered beyond the current network chunk.
+"""
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, Request, status
+from multipart.multipart import MultipartParser, parse_options_header
+
+
+class MultipartFileExtractor:
+    """Push-style multipart parser that keeps only the data of the selected file part"""
+
+    def __init__(self, boundary: bytes, field_name: str):
+        self.field_name = field_name
+        self._chunks: list[bytes] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._part_headers: dict[bytes, bytes] = {}
+        self._in_file = False
+        self._found = False
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    @property
+    def found(self) -> bool:
+        return self._found
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        """Parse a body chunk; returns the file data it contained"""
+        self._parser.write(chunk)
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+    def _on_part_begin(self):
+        self._part_headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._part_headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._part_headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("latin-1")
+        self._in_file = not self._found and name == self.field_name
+        if self._in_file:
+            self._found = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self._chunks.append(data[start:end])
+
+    def _on_part_end(self):
+        self._in_file = False
+
+
+def upload_charset(request: Request) -> Optional[str]:
+    """The charset parameter of a raw (non-multipart) upload's Content-Type, if any"""
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type == b"multipart/form-data":
+        return None
+    charset = options.get(b"charset")
+    return charset.decode("latin-1") if charset else None
+
+
+async def iter_upload(request: Request, field_name: str = "file") -> AsyncIterator[bytes]:
+    """Yield the uploaded file's bytes while the request body streams in"""
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data":
+        async for chunk in request.stream():
+            if chunk:
+                yield chunk
+        return
+
+    boundary = options.get(b"boundary")
+    if not boundary:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Multipart boundary missing"
+        )
+    extractor = MultipartFileExtractor(boundary, field_name)
+    async for chunk in request.stream():
+        for data in extractor.feed(chunk):
+            if data:
+                yield data
+    if not extractor.found:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Multipart body has no '{field_name}' file part"
+        )
@@ -0,0 +1,149 @@
+"""
+Startup warm-up and readiness (/ready).
+
+/health only says the process is up. /ready answers 503 until this worker has
+warmed up, so load balancers and orchestrators keep traffic away from cold
+workers after a deploy:
+
+  pool      open the read and primary pools up to their pool_size (TCP, TLS and
+            auth handshakes happen here, not in the first requests)
+  queries   run the hot routes once: /stats, the first page of /medicamentos
+            unfiltered and for the most common situações and categorias, and
+            /medicamentos/vencendo; this loads their pages into shared_buffers
+  memory    build the autocomplete index and read the snapshot manifest
+
+The warm-up runs in a thread after startup; a failing step is logged and
+reported but does not keep the worker out of rotation forever (the requests it
+would have warmed still work, only slower).
+"""
+import inspect
+import logging
+import threading
+import time
+from typing import Optional
+
+from fastapi import params
+from pydantic.fields import FieldInfo
+from sqlalchemy import func, text
+
+from app.autocomplete import autocomplete
+from app.database import engine, new_read_session, read_engine
+from app.models import Medicamento
+from app.routes.medicamentos import list_medicamentos, list_medicamentos_vencendo
+from app.routes.stats import get_stats
+from app.snapshots import read_manifest
+
+logger = logging.getLogger(__name__)
+
+# First pages primed for each of the most common filter values
+WARMUP_FILTER_VALUES = 3
+
+
+def call_endpoint(endpoint, **kwargs):
+    """Call a route function outside a request: Query() defaults become their values, dependencies None"""
+    for name, param in inspect.signature(endpoint).parameters.items():
+        if name in kwargs:
+            continue
+        default = param.default
+        if isinstance(default, params.Depends):
+            kwargs[name] = None
+        elif isinstance(default, FieldInfo):
+            kwargs[name] = default.default
+        else:
+            kwargs[name] = default
+    return endpoint(**kwargs)
+
+
+def _warm_pool(pool_engine) -> int:
+    """Check out pool_size connections at once, then return them all to the pool"""
+    connections = []
+    try:
+        for _ in range(pool_engine.pool.size()):
+            conn = pool_engine.connect()
+            connections.append(conn)
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in connections:
+            conn.close()
+    return len(connections)
+
+
+def _most_common(db, column, limit: int) -> list[str]:
+    rows = (
+        db.query(column)
+        .filter(column.isnot(None))
+        .group_by(column)
+        .order_by(func.count().desc())
+        .limit(limit)
+        .all()
+    )
+    return [value for value, in rows]
+
+
+def _warm_queries() -> int:
+    db = new_read_session()
+    try:
+        calls = [(get_stats, {}), (list_medicamentos, {}), (list_medicamentos_vencendo, {})]
+        for value in _most_common(db, Medicamento.situacao_registro, WARMUP_FILTER_VALUES):
+            calls.append((list_medicamentos, {"situacao": [value]}))
+        for value in _most_common(db, Medicamento.categoria_regulatoria, WARMUP_FILTER_VALUES):
+            calls.append((list_medicamentos, {"categoria_regulatoria": [value]}))
+        for endpoint, kwargs in calls:
+            call_endpoint(endpoint, db=db, **kwargs)
+        return len(calls)
+    finally:
+        db.close()
+
+
+def _warm_memory() -> int:
+    read_manifest()
+    return len(autocomplete.get_index())
+
+
+class Readiness:
+    """Warm-up progress of this worker, reported by /ready"""
+
+    def __init__(self):
+        self.ready = False
+        self.duration_ms: Optional[float] = None
+        self.steps: dict[str, dict] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def _step(self, name: str, fn, *args) -> None:
+        started = time.perf_counter()
+        try:
+            result = fn(*args)
+            self.steps[name] = {"ok": True, "result": result}
+        except Exception as e:
+            logger.exception("Warm-up step %s failed", name)
+            self.steps[name] = {"ok": False, "error": f"{e.__class__.__name__}: {e}"}
+        self.steps[name]["ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    def warm_up(self) -> None:
+        started = time.perf_counter()
+        if read_engine is not None:
+            self._step("read_pool", _warm_pool, read_engine)
+        self._step("pool", _warm_pool, engine)
+        self._step("queries", _warm_queries)
+        self._step("memory", _warm_memory)
+        self.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.ready = True
+        logger.info("Worker ready after %.0fms warm-up", self.duration_ms)
+
+    def start(self, enabled: bool = True) -> None:
+        """Warm up in a background thread (or mark ready at once when disabled)"""
+        if not enabled:
+            self.ready = True
+            return
+        self._thread = threading.Thread(target=self.warm_up, name="warmup", daemon=True)
+        self._thread.start()
+
+    def status(self) -> dict:
+        return {
+            "status": "ready" if self.ready else "warming_up",
+            "warmup_ms": self.duration_ms,
+            "steps": self.steps,
+        }
+
+
+readiness = Readiness()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Reproducible HTTP load benchmark for the API.
+
+For each dataset size: seeds the configured database with a synthetic, seeded
+medicamentos dataset (REPLACES the medicamentos table), creates real API keys,
+drives a scripted mix of /medicamentos filters, /search, /{id} and /stats with
+keep-alive HTTP clients, and reports throughput and p50/p95/p99 latency per
+endpoint as JSON. Same --seed, same data and same request sequence per client.
+
+The server must run with quotas disabled (RATE_LIMIT_PER_MINUTE=0 DAILY_QUOTA=0);
+--spawn starts uvicorn that way. 429s are counted as errors.
+
+Usage:
+    python scripts/bench_api.py --sizes 10000,100000 --spawn --workers 2 --output bench.json
+    python scripts/bench_api.py --base-url http://localhost:8000 --skip-seed --duration 60
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.auth import generate_api_key, hash_key
+from app.database import SessionLocal, settings
+from app.empresas import ensure_empresas
+from app.models import APIKey, Medicamento
+from scripts.import_csv import row_to_medicamento
+from scripts.synthetic import CATEGORIAS, CLASSES, SITUACOES, SUBSTANCIAS, generate_rows
+
+SEED_BATCH_SIZE = 5000
+BENCH_KEY_PREFIX = "bench-api"
+
+
+def _fragment(rng: random.Random, value: str) -> str:
+    """A word from a vocabulary value, as a user would type it"""
+    return rng.choice(value.split())
+
+
+def _list(rng, ids):
+    return f"/medicamentos?page={rng.randint(1, 20)}&limit=50"
+
+
+def _list_filtered(rng, ids):
+    name, value = rng.choice([
+        ("principio_ativo", _fragment(rng, rng.choice(SUBSTANCIAS))),
+        ("classe_terapeutica", rng.choice(CLASSES)),
+        ("situacao", rng.choice(SITUACOES)[0]),
+        ("categoria_regulatoria", rng.choice(CATEGORIAS)[0]),
+    ])
+    return f"/medicamentos?{name}={quote(value)}&limit=50"
+
+
+def _search(rng, ids):
+    return f"/medicamentos/search?q={quote(_fragment(rng, rng.choice(SUBSTANCIAS)))}&limit=20"
+
+
+def _detail(rng, ids):
+    return f"/medicamentos/{rng.randint(ids[0], ids[1])}"
+
+
+def _stats(rng, ids):
+    return "/stats"
+
+
+# (endpoint name, weight, path builder)
+MIX = [
+    ("list", 20, _list),
+    ("list_filtered", 25, _list_filtered),
+    ("search", 25, _search),
+    ("detail", 25, _detail),
+    ("stats", 5, _stats),
+]
+
+
+def seed_database(size: int, seed: int) -> None:
+    db: Session = SessionLocal()
+    try:
+        db.query(Medicamento).delete()
+        db.commit()
+        batch = []
+        for row in generate_rows(size, seed):
+            batch.append(row_to_medicamento(row))
+            if len(batch) >= SEED_BATCH_SIZE:
+                ensure_empresas(db, batch)
+                db.bulk_save_objects(batch)
+                db.commit()
+                batch = []
+        if batch:
+            ensure_empresas(db, batch)
+            db.bulk_save_objects(batch)
+            db.commit()
+    finally:
+        db.close()
+
+
+def dataset_shape() -> tuple[int, tuple[int, int]]:
+    """Row count and id range of the medicamentos table"""
+    db: Session = SessionLocal()
+    try:
+        count, low, high = db.query(
+            func.count(Medicamento.id), func.min(Medicamento.id), func.max(Medicamento.id)
+        ).one()
+        if not count:
+            raise SystemExit("The medicamentos table is empty: seed it first (drop --skip-seed).")
+        return count, (low, high)
+    finally:
+        db.close()
+
+
+def create_keys(count: int) -> list[str]:
+    """Real API keys, one per client thread"""
+    db: Session = SessionLocal()
+    keys = []
+    try:
+        for i in range(count):
+            key = generate_api_key()
+            db.add(APIKey(key=hash_key(key), name=f"{BENCH_KEY_PREFIX}-{i}", is_active=True))
+            keys.append(key)
+        db.commit()
+        return keys
+    finally:
+        db.close()
+
+
+def delete_keys() -> None:
+    db: Session = SessionLocal()
+    try:
+        db.query(APIKey).filter(APIKey.name.like(f"{BENCH_KEY_PREFIX}-%")).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    index = max(int(round(pct / 100 * len(values))) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+def _summary(latencies: list[float], errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p95_ms": round(_percentile(latencies, 95), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+    }
+
+
+def run_load(base_url: str, keys: list[str], ids: tuple[int, int], duration: float, seed: int) -> dict:
+    target = urlsplit(base_url)
+    prefix = target.path.rstrip("/") + settings.api_prefix
+    names = [name for name, _, _ in MIX]
+    weights = [weight for _, weight, _ in MIX]
+    builders = {name: builder for name, _, builder in MIX}
+    results = {name: {"latencies": [], "errors": 0} for name in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(index: int, api_key: str) -> None:
+        rng = random.Random(seed * 1000 + index)
+        local = {name: {"latencies": [], "errors": 0} for name in names}
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+        headers = {"X-API-Key": api_key, "Accept-Encoding": "identity"}
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights=weights)[0]
+            path = prefix + builders[name](rng, ids)
+            started = time.perf_counter()
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+                ok = False
+            if ok:
+                local[name]["latencies"].append((time.perf_counter() - started) * 1000)
+            else:
+                local[name]["errors"] += 1
+        conn.close()
+        with lock:
+            for name, data in local.items():
+                results[name]["latencies"].extend(data["latencies"])
+                results[name]["errors"] += data["errors"]
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i, key)) for i, key in enumerate(keys)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    endpoints = {name: _summary(data["latencies"], data["errors"], elapsed) for name, data in results.items()}
+    all_latencies = [lat for data in results.values() for lat in data["latencies"]]
+    all_errors = sum(data["errors"] for data in results.values())
+    return {"elapsed_seconds": round(elapsed, 2), "endpoints": endpoints, "total": _summary(all_latencies, all_errors, elapsed)}
+
+
+def spawn_server(port: int, workers: int) -> subprocess.Popen:
+    env = {**os.environ, "RATE_LIMIT_PER_MINUTE": "0", "DAILY_QUOTA": "0"}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=str(PROJECT_ROOT),
+        env=env,
+    )
+    for _ in range(120):
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise SystemExit("Server did not become healthy in time")
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=str(PROJECT_ROOT),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000", help="Comma-separated dataset sizes (rows)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-seed", action="store_true", help="Benchmark the data already in the database")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="Start uvicorn (quotas disabled) on --base-url's port")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when --spawn is set")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads, one API key each")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load per size")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    sizes = [None] if args.skip_seed else [int(size) for size in args.sizes.split(",")]
+    server = spawn_server(urlsplit(args.base_url).port or 80, args.workers) if args.spawn else None
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "seed": args.seed,
+            "concurrency": args.concurrency,
+            "duration_seconds": args.duration,
+            "workers": args.workers if args.spawn else None,
+            "mix": {name: weight for name, weight, _ in MIX},
+        },
+        "runs": [],
+    }
+    try:
+        for size in sizes:
+            if size is not None:
+                print(f"Seeding {size} synthetic rows (seed={args.seed})...", file=sys.stderr)
+                seed_database(size, args.seed)
+            keys = create_keys(args.concurrency)
+            try:
+                rows, ids = dataset_shape()
+                print(f"Running load for {args.duration}s...", file=sys.stderr)
+                run = run_load(args.base_url, keys, ids, args.duration, args.seed)
+            finally:
+                delete_keys()
+            report["runs"].append({"size": rows, **run})
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
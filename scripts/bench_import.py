@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Import throughput benchmark for scripts/import_csv.py.
+
+Generates a synthetic ANVISA-shaped CSV (or uses --csv), serves it from a local
+HTTP server so the download path is exercised, and runs the real import pipeline
+into the configured database (REPLACES the medicamentos table). Reports the time
+spent in each phase and peak RSS as JSON:
+
+  download   URL -> temp file
+  detect     encoding/delimiter detection
+  decode     reading and decoding text lines
+  parse      CSV parsing into dicts
+  transform  dicts -> Medicamento (date parsing, cleaning)
+  load       bulk inserts and commits
+  finalize   dataset generation and derived artifacts (snapshots, ...)
+
+decode/parse/transform/load are streamed through each other, so their times are
+measured exclusively by timing each stage's iterator.
+
+Usage:
+    python scripts/bench_import.py --rows 100000 [--seed 42] [--output import.json]
+    python scripts/bench_import.py --csv DADOS_ABERTOS_MEDICAMENTOS.csv
+"""
+import argparse
+import functools
+import http.server
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from scripts import import_csv as importer
+from scripts.synthetic import write_csv
+
+RSS_SAMPLE_INTERVAL = 0.05
+
+
+class TimedIterator:
+    """Wraps an iterator and accumulates the time spent producing its items (inclusive)"""
+
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+        self.seconds = 0.0
+        self.items = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            item = next(self._iterator)
+        finally:
+            self.seconds += time.perf_counter() - started
+        self.items += 1
+        return item
+
+
+class RSSSampler(threading.Thread):
+    """Samples resident memory in the background and keeps the peak per phase"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.phase = "startup"
+        self.peaks: dict[str, float] = {}
+        self._stop = threading.Event()
+        self._page_size = os.sysconf("SC_PAGE_SIZE")
+
+    def _rss_mb(self) -> float:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * self._page_size / 1024 / 1024
+
+    def run(self):
+        while not self._stop.is_set():
+            self.sample()
+            time.sleep(RSS_SAMPLE_INTERVAL)
+
+    def sample(self):
+        rss = self._rss_mb()
+        if rss > self.peaks.get(self.phase, 0.0):
+            self.peaks[self.phase] = round(rss, 1)
+
+    def enter(self, phase: str):
+        self.sample()
+        self.phase = phase
+
+    def stop(self):
+        self.sample()
+        self._stop.set()
+
+
+def serve_directory(directory: str) -> http.server.ThreadingHTTPServer:
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def run(csv_path: str, use_download: bool, batch_size: int) -> dict:
+    sampler = RSSSampler()
+    sampler.start()
+    phases = {}
+    db: Session = SessionLocal()
+    server = None
+    temp_path = None
+    try:
+        sampler.enter("download")
+        started = time.perf_counter()
+        if use_download:
+            server = serve_directory(str(Path(csv_path).parent))
+            url = f"http://127.0.0.1:{server.server_address[1]}/{Path(csv_path).name}"
+            local_path, temp_path = importer.resolve_source(url)
+        else:
+            local_path = csv_path
+        phases["download"] = time.perf_counter() - started
+
+        sampler.enter("detect")
+        started = time.perf_counter()
+        encoding, delimiter = importer.detect_encoding(local_path)
+        phases["detect"] = time.perf_counter() - started
+
+        sampler.enter("stream")
+        started = time.perf_counter()
+        importer.clear_medicamentos(db)
+        phases["clear"] = time.perf_counter() - started
+
+        stats = {"errors": 0}
+        started = time.perf_counter()
+        with open(local_path, "r", encoding=encoding, newline="", errors="ignore") as f:
+            lines = TimedIterator(f)
+            rows = TimedIterator(importer.iter_csv_rows(lines, delimiter))
+            medicamentos = TimedIterator(importer.transform_rows(rows, stats))
+            imported = importer.load_medicamentos(db, medicamentos, batch_size)
+        stream_total = time.perf_counter() - started
+        phases["decode"] = lines.seconds
+        phases["parse"] = rows.seconds - lines.seconds
+        phases["transform"] = medicamentos.seconds - rows.seconds
+        phases["load"] = stream_total - medicamentos.seconds
+
+        sampler.enter("finalize")
+        started = time.perf_counter()
+        importer.finalize_import(db, csv_path, imported)
+        phases["finalize"] = time.perf_counter() - started
+    finally:
+        sampler.stop()
+        db.close()
+        if server is not None:
+            server.shutdown()
+        if temp_path and os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+    total = sum(phases.values())
+    return {
+        "rows": imported,
+        "errors": stats["errors"],
+        "file_mb": round(os.path.getsize(csv_path) / 1024 / 1024, 1),
+        "encoding": encoding,
+        "total_seconds": round(total, 3),
+        "rows_per_second": round(imported / total) if total else 0,
+        "phases_seconds": {name: round(seconds, 3) for name, seconds in phases.items()},
+        "peak_rss_mb_by_phase": sampler.peaks,
+        # ru_maxrss is in KB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="Synthetic rows to generate (10k to 5M)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--csv", help="Use this CSV instead of generating one")
+    parser.add_argument("--no-download", action="store_true", help="Read the file directly (skip the HTTP download phase)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        generation_seconds = None
+        csv_path = args.csv
+        if not csv_path:
+            csv_path = os.path.join(tmpdir, f"synthetic_{args.rows}.csv")
+            started = time.perf_counter()
+            write_csv(csv_path, args.rows, args.seed)
+            generation_seconds = round(time.perf_counter() - started, 3)
+            print(f"Generated {args.rows} synthetic rows in {generation_seconds}s", file=sys.stderr)
+
+        # Keep the importer's progress output out of the JSON report
+        real_stdout = sys.stdout
+        sys.stdout = sys.stderr
+        try:
+            result = run(os.path.abspath(csv_path), not args.no_download, args.batch_size)
+        finally:
+            sys.stdout = real_stdout
+
+    report = {"seed": args.seed if not args.csv else None, "csv_generation_seconds": generation_seconds, **result}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
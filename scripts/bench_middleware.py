@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark: pure ASGI RequestContextMiddleware vs the previous
+@app.middleware("http") (BaseHTTPMiddleware) hook, on /health and /medicamentos.
+
+Requests are driven in-process through the ASGI interface (no network), so the
+numbers isolate framework and middleware overhead. /medicamentos needs the
+configured DATABASE_URL and a valid API key (--api-key or env API_KEY); per-key
+quotas are disabled for the run.
+
+Usage:
+    python scripts/bench_middleware.py --api-key KEY [--requests 2000] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Quotas would throttle the benchmark itself
+os.environ["RATE_LIMIT_PER_MINUTE"] = "0"
+os.environ["DAILY_QUOTA"] = "0"
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+from app.database import settings
+from app.main import health
+from app.middleware import RequestContextMiddleware
+from app.routes import medicamentos, auth, stats, admin
+
+
+def build_app(variant: str) -> FastAPI:
+    """Same routes as app.main, with the requested middleware variant"""
+    app = FastAPI()
+    if variant == "base_http":
+        @app.middleware("http")
+        async def ensure_utf8_middleware(request, call_next):
+            response = await call_next(request)
+            if response.headers.get("content-type", "").startswith("application/json"):
+                response.headers["content-type"] = "application/json; charset=utf-8"
+            return response
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    if variant == "pure_asgi":
+        app.add_middleware(RequestContextMiddleware)
+    for router in (medicamentos.router, auth.router, stats.router, admin.router):
+        app.include_router(router, prefix=settings.api_prefix)
+    app.add_api_route("/health", health, methods=["GET"])
+    return app
+
+
+async def asgi_get(app, path: str, headers: list[tuple[bytes, bytes]]) -> int:
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    status_code = 0
+    request_sent = False
+    response_complete = asyncio.Event()
+
+    async def receive():
+        # Like a real server: the body once, then block until the client disconnects
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await response_complete.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body", False):
+            response_complete.set()
+
+    await app(scope, receive, send)
+    return status_code
+
+
+async def run_case(app, path: str, headers, total: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    per_worker = total // concurrency
+
+    async def worker():
+        nonlocal errors
+        for _ in range(per_worker):
+            started = time.perf_counter()
+            status_code = await asgi_get(app, path, headers)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if status_code >= 400:
+                errors += 1
+
+    # Warm-up (DB pool, caches)
+    for _ in range(min(20, total)):
+        await asgi_get(app, path, headers)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 3),
+    }
+
+
+async def main_async(args) -> dict:
+    headers = [(b"host", b"bench")]
+    if args.api_key:
+        headers.append((b"x-api-key", args.api_key.encode()))
+    paths = ["/health"]
+    if args.api_key:
+        paths.append(f"{settings.api_prefix}/medicamentos?limit=50")
+    else:
+        print("No API key given: benchmarking /health only.", file=sys.stderr)
+
+    results = {}
+    for path in paths:
+        for variant in ("none", "base_http", "pure_asgi"):
+            app = build_app(variant)
+            results.setdefault(path, {})[variant] = await run_case(
+                app, path, headers, args.requests, args.concurrency
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api-key", default=os.environ.get("API_KEY"))
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for path, variants in results.items():
+        print(f"\n{path}")
+        print(f"  {'variant':<10} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for variant, r in variants.items():
+            print(f"  {variant:<10} {r['rps']:>10} {r['p50_ms']:>9} {r['p99_ms']:>9} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark the public-endpoint rate limiter under client churn.
+
+Drives N distinct client IPs (default 1,000,000) through SlidingWindowLimiter and
+reports traced memory and throughput at regular checkpoints. Memory must plateau
+once MAX_TRACKED_CLIENTS is reached instead of growing with the number of clients.
+
+Usage:
+    python scripts/bench_ratelimit.py [--clients 1000000] [--max-keys 100000]
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.ratelimit import (
+    MAX_REQUESTS_PER_WINDOW,
+    MAX_TRACKED_CLIENTS,
+    WINDOW_SECONDS,
+    SlidingWindowLimiter,
+)
+
+
+def ip_for(i: int) -> str:
+    return f"{(i >> 24) & 255}.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+
+
+def run(clients: int, max_keys: int, checkpoints: int) -> dict:
+    limiter = SlidingWindowLimiter(MAX_REQUESTS_PER_WINDOW, WINDOW_SECONDS, max_keys=max_keys)
+    step = max(clients // checkpoints, 1)
+    samples = []
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    for i in range(clients):
+        limiter.hit(ip_for(i))
+        if (i + 1) % step == 0:
+            current, peak = tracemalloc.get_traced_memory()
+            samples.append({
+                "clients": i + 1,
+                "tracked": len(limiter),
+                "memory_mb": round((current - baseline) / 1024 / 1024, 2),
+                "peak_mb": round((peak - baseline) / 1024 / 1024, 2),
+            })
+    elapsed = time.perf_counter() - started
+    tracemalloc.stop()
+
+    # Throughput without tracemalloc overhead, on a warm limiter at capacity
+    hot = 200_000
+    started = time.perf_counter()
+    for i in range(clients, clients + hot):
+        limiter.hit(ip_for(i))
+    hot_elapsed = time.perf_counter() - started
+
+    return {
+        "clients": clients,
+        "max_keys": max_keys,
+        "traced_seconds": round(elapsed, 2),
+        "hits_per_second": round(hot / hot_elapsed),
+        "samples": samples,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=1_000_000)
+    parser.add_argument("--max-keys", type=int, default=MAX_TRACKED_CLIENTS)
+    parser.add_argument("--checkpoints", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    result = run(args.clients, args.max_keys, args.checkpoints)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{'clients':>10} {'tracked':>10} {'memory MB':>10} {'peak MB':>10}")
+    for sample in result["samples"]:
+        print(f"{sample['clients']:>10} {sample['tracked']:>10} {sample['memory_mb']:>10} {sample['peak_mb']:>10}")
+    print(f"\nThroughput at capacity: {result['hits_per_second']:,} hits/s")
+    ceiling = result["samples"][-1]["peak_mb"] if result["samples"] else 0
+    print(f"Memory ceiling: {ceiling} MB for {args.max_keys:,} tracked clients")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,8 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from sqlalchemy.orm import Session
-from app.database import SessionLocal, init_db
+from app.database import SessionLocal, engine
+from app.migrations import verify_schema
 from app.models import APIKey
 from app.auth import generate_api_key, hash_key
 
@@ -15,8 +16,8 @@ def create_first_api_key(name: str = "Initial Admin Key"):
     db: Session = SessionLocal()
     
     try:
-        # Initialize database
-        init_db()
+        # Schema is managed by scripts/migrate.py
+        verify_schema(engine)
         
         # Check if any keys exist
         existing_keys = db.query(APIKey).count()
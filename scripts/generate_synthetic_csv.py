@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic ANVISA-shaped medicamentos CSV (same headers, `;` delimiter,
+ISO-8859-1 with Portuguese accents, DD/MM/YYYY dates, realistic null rates).
+
+Usage:
+    python scripts/generate_synthetic_csv.py --rows 100000 [--seed 42] [--output synthetic.csv]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.synthetic import write_csv
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000, help="Number of rows (10k to 5M)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Output path (default: synthetic_<rows>.csv)")
+    args = parser.parse_args()
+
+    output = args.output or f"synthetic_{args.rows}.csv"
+    started = time.perf_counter()
+    size = write_csv(output, args.rows, args.seed)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {args.rows} rows ({size / 1024 / 1024:.1f} MB) to {output} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
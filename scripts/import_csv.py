@@ -1,51 +1,120 @@
+import codecs
 import csv
 import os
+import shutil
 import ssl
 import sys
 import tempfile
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
+from typing import Iterable, Iterator, Optional
 from urllib.request import urlopen, Request
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from sqlalchemy import text
 from sqlalchemy.orm import Session
-from app.database import SessionLocal, init_db
-from app.models import Medicamento
+from app.alteracoes import record_changes
+from app.database import SessionLocal, engine
+from app.empresas import ensure_empresas, parse_empresa, refresh_empresa_counts
+from app.equivalencias import build_grupos_equivalencia
+from app.filtros import build_valores_filtro
+from app.generations import notify_new_generation
+from app.migrations import verify_schema
+from app.models import DatasetGeneration, Medicamento
+from app.snapshots import write_snapshots
+from app.substancias import build_substancias
+from app.text import normalize_search_text
 
 # Default source: ANVISA open data (import by URL, not local file)
 DEFAULT_CSV_URL = "https://dados.anvisa.gov.br/dados/DADOS_ABERTOS_MEDICAMENTOS.csv"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# ISO-8859-1 detected by chardet on the ANVISA file, tried first
+ENCODINGS = ['iso-8859-1', 'cp1252', 'latin-1', 'utf-8']
+PORTUGUESE_CHARS = ['ã', 'ç', 'é', 'ê', 'ô', 'õ', 'á', 'í', 'ó', 'ú',
+                    'Ã', 'Ç', 'É', 'Ê', 'Ô', 'Õ', 'Á', 'Í', 'Ó', 'Ú']
+# Bytes read to pick the encoding and delimiter
+SAMPLE_SIZE = 64 * 1024
+# Header columns a file must have to be taken as an ANVISA export
+REQUIRED_COLUMNS = ['NOME_PRODUTO', 'PRINCIPIO_ATIVO', 'SITUACAO_REGISTRO']
+# Arbitrary constant: one import at a time across workers and hosts (pg_try_advisory_lock)
+IMPORT_LOCK_ID = 7_212_026_045
+# Exit status of the CLI when another import holds the lock (EX_TEMPFAIL)
+IMPORT_LOCKED_EXIT_CODE = 75
 
 
-def _download_url(url: str, dest_path: str) -> None:
-    """Download URL to file. Uses certifi CA bundle; if SSL fails and DISABLE_SSL_VERIFY=1, retries without verification."""
-    from urllib.error import URLError
-    req = Request(url, headers={"User-Agent": "MedicamentosAPI/1.0"})
+class ImportLocked(RuntimeError):
+    """Another import (CLI, upload or scheduler, in any worker or host) is running"""
 
-    def _do_download(ctx: ssl.SSLContext) -> None:
-        with urlopen(req, context=ctx, timeout=300) as resp:
-            with open(dest_path, "wb") as f:
-                f.write(resp.read())
+
+@contextmanager
+def import_lock():
+    """
+    Try the import advisory lock on a dedicated connection, held until the block exits.
+    Yields False (without waiting) when another import holds it.
+    """
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        acquired = conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": IMPORT_LOCK_ID}).scalar()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": IMPORT_LOCK_ID})
+
+
+def _with_ssl_fallback(fn):
+    """Call fn(ssl_context) with the certifi CA bundle; if SSL fails and DISABLE_SSL_VERIFY=1, retries without verification."""
+    from urllib.error import URLError
 
     # Prefer certifi CA bundle
     try:
         import certifi
         ctx = ssl.create_default_context(cafile=certifi.where())
-        _do_download(ctx)
-        return
+        return fn(ctx)
     except (URLError, OSError) as e:
         if "CERTIFICATE_VERIFY_FAILED" not in str(e) and "certificate verify failed" not in str(e).lower():
             raise
         if os.environ.get("DISABLE_SSL_VERIFY", "").strip().lower() in ("1", "true", "yes"):
             print("Warning: SSL verification disabled (DISABLE_SSL_VERIFY). Use only in trusted environments.")
             ctx = ssl._create_unverified_context()
-            _do_download(ctx)
-            return
+            return fn(ctx)
         print("Hint: set DISABLE_SSL_VERIFY=1 to allow download without SSL verification (WSL/Docker/minimal env).")
         raise
 
 
+def _download_url(url: str, dest_path: str) -> None:
+    """Download URL to file (see _with_ssl_fallback)."""
+    req = Request(url, headers={"User-Agent": "MedicamentosAPI/1.0"})
+
+    def _do_download(ctx: ssl.SSLContext) -> None:
+        with urlopen(req, context=ctx, timeout=300) as resp:
+            with open(dest_path, "wb") as f:
+                shutil.copyfileobj(resp, f, DOWNLOAD_CHUNK_SIZE)
+
+    _with_ssl_fallback(_do_download)
+
+
+def fetch_source_version(url: str) -> Optional[str]:
+    """
+    Version of the file behind `url` from a HEAD request: the ETag, else
+    Last-Modified plus Content-Length. None when the server sends neither.
+    """
+    req = Request(url, method="HEAD", headers={"User-Agent": "MedicamentosAPI/1.0"})
+
+    def _do_head(ctx: ssl.SSLContext) -> Optional[str]:
+        with urlopen(req, context=ctx, timeout=60) as resp:
+            if resp.headers.get("ETag"):
+                return resp.headers["ETag"]
+            if resp.headers.get("Last-Modified"):
+                return f"{resp.headers['Last-Modified']}; {resp.headers.get('Content-Length', '')}"
+            return None
+
+    return _with_ssl_fallback(_do_head)
+
+
 def parse_date(date_str):
     """Parse date from DD/MM/YYYY format"""
     if not date_str or date_str.strip() == "":
@@ -66,156 +135,288 @@ def clean_string(value):
     return value
 
 
-def import_csv(csv_path: str, batch_size: int = 1000):
-    """Import CSV from file path or URL into database."""
+def row_to_medicamento(row: dict) -> Medicamento:
+    """Build a Medicamento from a CSV row keyed by the ANVISA column names"""
+    medicamento = Medicamento(
+        tipo_produto=clean_string(row.get('TIPO_PRODUTO')),
+        nome_produto=clean_string(row.get('NOME_PRODUTO')),
+        data_finalizacao_processo=parse_date(row.get('DATA_FINALIZACAO_PROCESSO')),
+        categoria_regulatoria=clean_string(row.get('CATEGORIA_REGULATORIA')),
+        numero_registro_produto=clean_string(row.get('NUMERO_REGISTRO_PRODUTO')),
+        data_vencimento_registro=parse_date(row.get('DATA_VENCIMENTO_REGISTRO')),
+        numero_processo=clean_string(row.get('NUMERO_PROCESSO')),
+        classe_terapeutica=clean_string(row.get('CLASSE_TERAPEUTICA')),
+        empresa_detentora_registro=clean_string(row.get('EMPRESA_DETENTORA_REGISTRO')),
+        situacao_registro=clean_string(row.get('SITUACAO_REGISTRO')),
+        principio_ativo=clean_string(row.get('PRINCIPIO_ATIVO'))
+    )
+    medicamento.nome_produto_busca = normalize_search_text(medicamento.nome_produto)
+    medicamento.principio_ativo_busca = normalize_search_text(medicamento.principio_ativo)
+    medicamento.classe_terapeutica_busca = normalize_search_text(medicamento.classe_terapeutica)
+    empresa = parse_empresa(medicamento.empresa_detentora_registro)
+    medicamento.empresa_cnpj = empresa[0] if empresa else None
+    return medicamento
+
+
+def resolve_source(csv_path: str) -> tuple[Optional[str], Optional[str]]:
+    """
+    Resolve the CSV source to a local file: URL -> download to temp file; env CSV_URL
+    overrides a local path. Returns (local_path, temp_path_to_delete); local_path is None
+    when the file does not exist.
+    """
+    url = None
+    if csv_path.strip().startswith(("http://", "https://")):
+        url = csv_path.strip()
+        print(f"Downloading CSV from {url}...")
+    elif os.environ.get("CSV_URL"):
+        url = os.environ.get("CSV_URL")
+        print(f"Downloading CSV from CSV_URL: {url}...")
+    elif not os.path.exists(csv_path):
+        print(f"Error: File or URL not found: {csv_path}")
+        return None, None
+    else:
+        return csv_path, None
+
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".csv")
+    temp_file.close()
+    try:
+        _download_url(url, temp_file.name)
+    except BaseException:
+        os.unlink(temp_file.name)
+        raise
+    return temp_file.name, temp_file.name
+
+
+def detect_encoding(csv_path: str) -> tuple[Optional[str], str]:
+    """Pick the encoding and delimiter from the first SAMPLE_SIZE bytes of the file"""
+    with open(csv_path, 'rb') as f:
+        return detect_encoding_sample(f.read(SAMPLE_SIZE))
+
+
+def _detect_delimiter(text: str) -> str:
+    return ';' if ';' in text[:1024] else ','
+
+
+def detect_encoding_sample(sample: bytes, prefer_utf8: bool = False) -> tuple[Optional[str], str]:
+    """
+    Pick the encoding and delimiter from the start of the data. Encodings are tried in
+    order; the first one that decodes the sample and shows Portuguese characters wins,
+    otherwise the last one that decoded it.
+    With prefer_utf8 (uploads: usually a file fixed and re-saved locally) a sample that
+    is valid UTF-8 is taken as UTF-8 first. iso-8859-1 decodes any bytes, and UTF-8
+    accents then pass as Portuguese characters ("Ó" becomes "Ã“").
+    """
+    if prefer_utf8:
+        try:
+            decoded = codecs.getincrementaldecoder('utf-8')(errors='strict').decode(sample, final=False)
+        except UnicodeDecodeError:
+            pass
+        else:
+            return 'utf-8', _detect_delimiter(decoded)
+    used_encoding = None
+    text = ""
+    for encoding in ENCODINGS:
+        try:
+            # Incremental decoder: a multi-byte sequence cut at the end of the sample is not an error
+            decoded = codecs.getincrementaldecoder(encoding)(errors='strict').decode(sample, final=False)
+        except UnicodeDecodeError:
+            continue
+        used_encoding, text = encoding, decoded
+        if any(char in decoded for char in PORTUGUESE_CHARS):
+            print(f"✓ Encoding {encoding} appears correct (found Portuguese characters)")
+            break
+    return used_encoding, _detect_delimiter(text)
+
+
+def missing_columns(header_line: str, delimiter: str) -> list[str]:
+    """REQUIRED_COLUMNS absent from a CSV header line"""
+    columns = {column.strip().lstrip('\ufeff') for column in next(csv.reader([header_line], delimiter=delimiter), [])}
+    return [column for column in REQUIRED_COLUMNS if column not in columns]
+
+
+def iter_decoded_lines(chunks: Iterable[bytes], encoding: str) -> Iterator[str]:
+    """
+    Decode byte chunks (e.g. an upload stream) incrementally into text lines, keeping
+    the line endings like a file opened with newline='' (what the csv module expects).
+    Only the current chunk and one partial line are held in memory.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='ignore')
+    pending = ""
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def iter_csv_rows(lines: Iterable[str], delimiter: str) -> Iterator[dict]:
+    """Parse CSV lines (any iterable of text lines, e.g. an open file) into dicts"""
+    return csv.DictReader(lines, delimiter=delimiter)
+
+
+def transform_rows(rows: Iterable[dict], stats: dict) -> Iterator[Medicamento]:
+    """Turn CSV rows into Medicamento objects, skipping (and counting) bad rows"""
+    for i, row in enumerate(rows, 1):
+        try:
+            yield row_to_medicamento(row)
+        except Exception as e:
+            stats["errors"] = stats.get("errors", 0) + 1
+            if stats["errors"] <= 10:  # Print first 10 errors
+                print(f"Error importing row {i}: {e}")
+
+
+def clear_medicamentos(db: Session, commit: bool = True) -> None:
+    existing_count = db.query(Medicamento).count()
+    if existing_count > 0:
+        print(f"\nWarning: Found {existing_count} existing records in database.")
+        print("Clearing existing data to reimport with correct encoding...")
+        db.query(Medicamento).delete()
+        if commit:
+            db.commit()
+        print("Existing data cleared.")
+
+
+def load_medicamentos(
+    db: Session, medicamentos: Iterable[Medicamento], batch_size: int = 1000, commit: bool = True
+) -> int:
+    """
+    Bulk insert in batches (companies first, for the empresa_cnpj foreign key); returns
+    the number of rows imported. With commit=False every batch stays in the caller's transaction.
+    """
+    batch = []
+    imported = 0
+    for medicamento in medicamentos:
+        batch.append(medicamento)
+        if len(batch) >= batch_size:
+            ensure_empresas(db, batch)
+            db.bulk_save_objects(batch)
+            if commit:
+                db.commit()
+            imported += len(batch)
+            print(f"Imported {imported} rows...")
+            batch = []
+    # Import remaining batch
+    if batch:
+        ensure_empresas(db, batch)
+        db.bulk_save_objects(batch)
+        if commit:
+            db.commit()
+        imported += len(batch)
+    return imported
+
+
+def finalize_import(
+    db: Session, source: str, imported: int, source_version: Optional[str] = None
+) -> DatasetGeneration:
+    """
+    Record the new dataset generation, build its derived artifacts and announce it.
+    The generation, its changes and the derived tables commit together (with the rows
+    too on the atomic path): nothing sees a generation whose tables are half built.
+    """
+    generation = DatasetGeneration(source=source, source_version=source_version, row_count=imported)
+    db.add(generation)
+    db.flush()
+    changes = record_changes(db, generation.id)
+    links = build_substancias(db)
+    grupos = build_grupos_equivalencia(db)
+    valores = build_valores_filtro(db)
+    refresh_empresa_counts(db)
+    db.commit()
+    print(f"Dataset generation: {generation.id}")
+    print(f"Changes: {', '.join(f'{count} {tipo}' for tipo, count in changes.items())}")
+    print(f"Active ingredients linked: {links} links")
+    print(f"Equivalence groups: {grupos}")
+    print(f"Filter values: {valores}")
+
+    # Snapshots are a derived artifact: a failure here must not fail the import
+    try:
+        manifest = write_snapshots(db, generation.id)
+        print(f"Snapshots written: {', '.join(f['name'] for f in manifest['files'].values())}")
+    except Exception as e:
+        print(f"Warning: could not write dataset snapshots: {e}")
+    notify_new_generation(engine, generation.id)
+    return generation
+
+
+def import_rows(
+    db: Session, rows: Iterable[dict], source: str, batch_size: int = 1000, atomic: bool = False,
+    source_version: Optional[str] = None,
+) -> Optional[DatasetGeneration]:
+    """
+    Replace the dataset with `rows` (dicts keyed by the ANVISA column names), streaming:
+    only one batch is held in memory. Shared by the CLI and the admin upload endpoint.
+    With atomic=True the delete, every batch and the derived tables commit together, so
+    a source that fails midway (e.g. an interrupted upload) leaves the previous dataset
+    in place and readers never see a partial catalogue.
+    Callers hold import_lock().
+    """
+    clear_medicamentos(db, commit=not atomic)
+    stats = {"errors": 0}
+    imported = load_medicamentos(db, transform_rows(rows, stats), batch_size, commit=not atomic)
+    if atomic:
+        if not imported:
+            # Nothing parsed (wrong file, truncated upload): keep the current dataset
+            db.rollback()
+            raise ValueError("No rows imported; keeping the current dataset")
+
+    print(f"\nImport completed!")
+    print(f"Successfully imported: {imported} rows")
+    print(f"Errors: {stats['errors']} rows")
+    return finalize_import(db, source, imported, source_version)
+
+
+def import_csv(
+    csv_path: str, batch_size: int = 1000, source_version: Optional[str] = None, take_lock: bool = True,
+    atomic: bool = False,
+):
+    """
+    Import CSV from file path or URL into database. Raises ImportLocked when another
+    import is running; take_lock=False when the caller already holds import_lock().
+    atomic=True (see import_rows) when the API is serving the table during the import.
+    """
+    if take_lock:
+        with import_lock() as acquired:
+            if not acquired:
+                raise ImportLocked("Another import is running")
+            return import_csv(csv_path, batch_size, source_version, take_lock=False, atomic=atomic)
+
     db: Session = SessionLocal()
-    temp_file = None
+    temp_path = None
+    source = csv_path
 
     try:
-        print("Initializing database...")
-        init_db()
-
-        # Resolve source: URL -> download to temp file; env CSV_URL overrides default path
-        if csv_path.strip().startswith(("http://", "https://")):
-            url = csv_path.strip()
-            print(f"Downloading CSV from {url}...")
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".csv")
-            temp_file.close()
-            _download_url(url, temp_file.name)
-            csv_path = temp_file.name
-        elif os.environ.get("CSV_URL"):
-            url = os.environ.get("CSV_URL")
-            print(f"Downloading CSV from CSV_URL: {url}...")
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".csv")
-            temp_file.close()
-            _download_url(url, temp_file.name)
-            csv_path = temp_file.name
-        elif not os.path.exists(csv_path):
-            print(f"Error: File or URL not found: {csv_path}")
+        print("Checking database schema...")
+        verify_schema(engine)
+
+        csv_path, temp_path = resolve_source(csv_path)
+        if csv_path is None:
             return
 
         print(f"Reading CSV: {csv_path}")
-        
-        # Read CSV with different encodings (ISO-8859-1 detected by chardet, try it first)
-        encodings = ['iso-8859-1', 'cp1252', 'latin-1', 'utf-8']
-        csv_data = None
-        used_encoding = None
-        
-        for encoding in encodings:
-            try:
-                # Use 'strict' or 'ignore' instead of 'replace' to avoid replacement characters
-                with open(csv_path, 'r', encoding=encoding, newline='', errors='strict') as f:
-                    # Try to detect if it's semicolon or comma separated
-                    sample = f.read(1024)
-                    f.seek(0)
-                    delimiter = ';' if ';' in sample else ','
-                    f.seek(0)
-                    reader = csv.DictReader(f, delimiter=delimiter)
-                    csv_data = list(reader)
-                    used_encoding = encoding
-                    print(f"Successfully read CSV with encoding: {encoding}")
-                    # Test if encoding is correct by checking for common Portuguese characters (both lower and UPPER case)
-                    if csv_data:
-                        test_sample = str(csv_data[0])
-                        portuguese_chars = ['ã', 'ç', 'é', 'ê', 'ô', 'õ', 'á', 'í', 'ó', 'ú', 
-                                           'Ã', 'Ç', 'É', 'Ê', 'Ô', 'Õ', 'Á', 'Í', 'Ó', 'Ú']
-                        if any(char in test_sample for char in portuguese_chars):
-                            print(f"✓ Encoding {encoding} appears correct (found Portuguese characters)")
-                            break
-            except UnicodeDecodeError:
-                # Try with 'ignore' if strict fails
-                try:
-                    with open(csv_path, 'r', encoding=encoding, newline='', errors='ignore') as f:
-                        sample = f.read(1024)
-                        f.seek(0)
-                        delimiter = ';' if ';' in sample else ','
-                        f.seek(0)
-                        reader = csv.DictReader(f, delimiter=delimiter)
-                        csv_data = list(reader)
-                        used_encoding = encoding
-                        print(f"Successfully read CSV with encoding: {encoding} (using errors='ignore')")
-                        if csv_data:
-                            test_sample = str(csv_data[0])
-                            portuguese_chars = ['ã', 'ç', 'é', 'ê', 'ô', 'õ', 'á', 'í', 'ó', 'ú', 
-                                               'Ã', 'Ç', 'É', 'Ê', 'Ô', 'Õ', 'Á', 'Í', 'Ó', 'Ú']
-                            if any(char in test_sample for char in portuguese_chars):
-                                print(f"✓ Encoding {encoding} appears correct")
-                                break
-                except Exception as e:
-                    print(f"Failed to read with encoding {encoding}: {e}")
-                    continue
-            except Exception as e:
-                print(f"Failed to read with encoding {encoding}: {e}")
-                continue
-        
-        if csv_data is None:
+        encoding, delimiter = detect_encoding(csv_path)
+        if encoding is None:
             print("Error: Could not read CSV with any encoding")
             return
-        
-        print(f"Found {len(csv_data)} rows to import")
-        
-        # Check for existing data
-        existing_count = db.query(Medicamento).count()
-        if existing_count > 0:
-            print(f"\nWarning: Found {existing_count} existing records in database.")
-            print("Clearing existing data to reimport with correct encoding...")
-            db.query(Medicamento).delete()
-            db.commit()
-            print("Existing data cleared.")
-        
-        # Import in batches
-        batch = []
-        imported = 0
-        errors = 0
-        
-        for i, row in enumerate(csv_data, 1):
-            try:
-                medicamento = Medicamento(
-                    tipo_produto=clean_string(row.get('TIPO_PRODUTO')),
-                    nome_produto=clean_string(row.get('NOME_PRODUTO')),
-                    data_finalizacao_processo=parse_date(row.get('DATA_FINALIZACAO_PROCESSO')),
-                    categoria_regulatoria=clean_string(row.get('CATEGORIA_REGULATORIA')),
-                    numero_registro_produto=clean_string(row.get('NUMERO_REGISTRO_PRODUTO')),
-                    data_vencimento_registro=parse_date(row.get('DATA_VENCIMENTO_REGISTRO')),
-                    numero_processo=clean_string(row.get('NUMERO_PROCESSO')),
-                    classe_terapeutica=clean_string(row.get('CLASSE_TERAPEUTICA')),
-                    empresa_detentora_registro=clean_string(row.get('EMPRESA_DETENTORA_REGISTRO')),
-                    situacao_registro=clean_string(row.get('SITUACAO_REGISTRO')),
-                    principio_ativo=clean_string(row.get('PRINCIPIO_ATIVO'))
-                )
-                batch.append(medicamento)
-                
-                if len(batch) >= batch_size:
-                    db.bulk_save_objects(batch)
-                    db.commit()
-                    imported += len(batch)
-                    print(f"Imported {imported} rows...")
-                    batch = []
-            except Exception as e:
-                errors += 1
-                if errors <= 10:  # Print first 10 errors
-                    print(f"Error importing row {i}: {e}")
-                continue
-        
-        # Import remaining batch
-        if batch:
-            db.bulk_save_objects(batch)
-            db.commit()
-            imported += len(batch)
-        
-        print(f"\nImport completed!")
-        print(f"Successfully imported: {imported} rows")
-        print(f"Errors: {errors} rows")
-        
+        print(f"Successfully read CSV with encoding: {encoding}")
+
+        with open(csv_path, 'r', encoding=encoding, newline='', errors='ignore') as f:
+            return import_rows(
+                db, iter_csv_rows(f, delimiter), source, batch_size, atomic=atomic, source_version=source_version
+            )
+
     except Exception as e:
         print(f"Error during import: {e}")
         db.rollback()
         raise
     finally:
         db.close()
-        if temp_file and os.path.exists(temp_file.name):
+        if temp_path and os.path.exists(temp_path):
             try:
-                os.unlink(temp_file.name)
+                os.unlink(temp_path)
             except OSError:
                 pass
 
@@ -225,4 +426,8 @@ if __name__ == "__main__":
     csv_path = os.environ.get("CSV_URL") or DEFAULT_CSV_URL
     if len(sys.argv) > 1:
         csv_path = sys.argv[1]
-    import_csv(csv_path)
+    try:
+        import_csv(csv_path)
+    except ImportLocked as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(IMPORT_LOCKED_EXIT_CODE)
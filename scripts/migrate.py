@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Apply database schema migrations (app/migrations). Run as a deploy step before
+starting the API; safe to run concurrently (serialized by an advisory lock).
+
+Usage:
+    python scripts/migrate.py            # apply all pending migrations
+    python scripts/migrate.py --check    # exit 1 if migrations are pending
+    python scripts/migrate.py --target 3 # apply up to version 3
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import engine
+from app.migrations import SCHEMA_VERSION, current_version, migrate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="Only report the schema version")
+    parser.add_argument("--target", type=int, default=None, help="Stop at this version")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        version = current_version(conn)
+    print(f"Schema version: {version} (code expects {SCHEMA_VERSION})")
+    if args.check:
+        sys.exit(0 if version >= SCHEMA_VERSION else 1)
+
+    applied = migrate(engine, target=args.target)
+    if applied:
+        print(f"Applied: {', '.join(str(v) for v in applied)}")
+    else:
+        print("Nothing to apply.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Deterministic synthetic ANVISA-shaped medicamento rows for benchmarks.
+
+Rows are dicts keyed by the ANVISA CSV headers with raw string values exactly as
+they appear in DADOS_ABERTOS_MEDICAMENTOS.csv (DD/MM/YYYY dates, empty strings
+for nulls, Portuguese accents), so they can go through the real import code.
+The same seed always yields the same rows.
+"""
+import csv
+import os
+import random
+from datetime import date, timedelta
+from typing import Iterator
+
+CSV_HEADERS = [
+    "TIPO_PRODUTO",
+    "NOME_PRODUTO",
+    "DATA_FINALIZACAO_PROCESSO",
+    "CATEGORIA_REGULATORIA",
+    "NUMERO_REGISTRO_PRODUTO",
+    "DATA_VENCIMENTO_REGISTRO",
+    "NUMERO_PROCESSO",
+    "CLASSE_TERAPEUTICA",
+    "EMPRESA_DETENTORA_REGISTRO",
+    "SITUACAO_REGISTRO",
+    "PRINCIPIO_ATIVO",
+]
+
+SUBSTANCIAS = [
+    "PARACETAMOL", "DIPIRONA SÓDICA", "DIPIRONA MONOIDRATADA", "IBUPROFENO", "CAFEÍNA",
+    "AMOXICILINA", "CLAVULANATO DE POTÁSSIO", "AZITROMICINA DI-HIDRATADA", "LOSARTANA POTÁSSICA",
+    "HIDROCLOROTIAZIDA", "CLORIDRATO DE METFORMINA", "GLIBENCLAMIDA", "OMEPRAZOL",
+    "PANTOPRAZOL SÓDICO SESQUI-HIDRATADO", "SINVASTATINA", "ATORVASTATINA CÁLCICA",
+    "ÁCIDO ACETILSALICÍLICO", "CLORIDRATO DE SERTRALINA", "CLONAZEPAM", "CARBAMAZEPINA",
+    "MALEATO DE ENALAPRIL", "BESILATO DE ANLODIPINO", "PREDNISONA", "DEXAMETASONA",
+    "CLORIDRATO DE PROMETAZINA", "ORFENADRINA", "CITRATO DE SILDENAFILA", "LEVOTIROXINA SÓDICA",
+    "INSULINA HUMANA", "VACINA INFLUENZA TRIVALENTE", "ÓLEO DE MELALEUCA", "EXTRATO DE GUACO",
+]
+
+CLASSES = [
+    "ANALGÉSICOS", "ANTIINFLAMATÓRIOS", "ANTIBIÓTICOS SISTÊMICOS", "ANTI-HIPERTENSIVOS",
+    "ANTIDIABÉTICOS", "ANTIULCEROSOS", "HIPOLIPEMIANTES", "ANTIDEPRESSIVOS",
+    "ANSIOLÍTICOS", "ANTIEPILÉPTICOS", "CORTICOSTERÓIDES", "ANTIALÉRGICOS",
+    "HORMÔNIOS TIREOIDIANOS", "VACINAS", "FITOTERÁPICOS", "VASODILATADORES",
+]
+
+CATEGORIAS = [
+    ("GENÉRICO", 35), ("SIMILAR", 35), ("NOVO", 12), ("ESPECÍFICO", 8),
+    ("BIOLÓGICO", 5), ("FITOTERÁPICO", 3), ("DINAMIZADO", 1), ("RADIOFÁRMACO", 1),
+]
+SITUACOES = [("VÁLIDO", 55), ("CADUCO/CANCELADO", 45)]
+
+EMPRESA_PREFIXOS = ["EMS", "EUROFARMA", "MEDLEY", "ACHÉ", "HYPERA", "CRISTÁLIA", "GERMED",
+                    "PRATI DONADUZZI", "NEO QUÍMICA", "BIOLAB", "LIBBS", "SANOFI", "ZODIAC"]
+EMPRESA_SUFIXOS = ["INDÚSTRIA FARMACÊUTICA LTDA", "S/A", "LABORATÓRIOS FARMACÊUTICOS S.A.",
+                   "FARMACÊUTICA LTDA", "INDÚSTRIA E COMÉRCIO LTDA"]
+MARCAS = ["DOR", "FLEX", "MAX", "PLUS", "GRIP", "TENS", "GLIC", "PRAZOL", "CORT", "VITA", "PEN", "FEN"]
+
+# Share of rows with an empty value, per column (roughly what the real file shows)
+NULL_RATES = {
+    "DATA_FINALIZACAO_PROCESSO": 0.02,
+    "NUMERO_REGISTRO_PRODUTO": 0.01,
+    "DATA_VENCIMENTO_REGISTRO": 0.12,
+    "CLASSE_TERAPEUTICA": 0.22,
+    "PRINCIPIO_ATIVO": 0.04,
+}
+
+
+def _weighted(rng: random.Random, choices: list[tuple[str, int]]) -> str:
+    return rng.choices([c for c, _ in choices], weights=[w for _, w in choices])[0]
+
+
+def _date(rng: random.Random, first_year: int, last_year: int) -> str:
+    start = date(first_year, 1, 1)
+    days = (date(last_year, 12, 31) - start).days
+    return (start + timedelta(days=rng.randint(0, days))).strftime("%d/%m/%Y")
+
+
+def _cnpj(rng: random.Random) -> str:
+    return "".join(str(rng.randint(0, 9)) for _ in range(14))
+
+
+def generate_rows(count: int, seed: int = 42) -> Iterator[dict]:
+    """Yield `count` ANVISA-shaped rows; deterministic for a given seed"""
+    rng = random.Random(seed)
+    empresas = [
+        f"{_cnpj(rng)} - {rng.choice(EMPRESA_PREFIXOS)} {rng.choice(EMPRESA_SUFIXOS)}"
+        for _ in range(max(count // 50, 20))
+    ]
+    for i in range(count):
+        n_substancias = rng.choices([1, 2, 3], weights=[80, 16, 4])[0]
+        substancias = rng.sample(SUBSTANCIAS, n_substancias)
+        categoria = _weighted(rng, CATEGORIAS)
+        if categoria == "GENÉRICO":
+            nome = " + ".join(substancias)
+        else:
+            nome = f"{rng.choice(MARCAS)}{rng.choice(MARCAS)} {rng.randint(1, 999)}".strip()
+        row = {
+            "TIPO_PRODUTO": "MEDICAMENTO",
+            "NOME_PRODUTO": nome,
+            "DATA_FINALIZACAO_PROCESSO": _date(rng, 1990, 2024),
+            "CATEGORIA_REGULATORIA": categoria,
+            "NUMERO_REGISTRO_PRODUTO": str(100000000 + i * 7),
+            "DATA_VENCIMENTO_REGISTRO": _date(rng, 2020, 2034),
+            "NUMERO_PROCESSO": f"25351.{rng.randint(0, 999999):06d}/{rng.randint(1990, 2024)}-{rng.randint(0, 99):02d}",
+            "CLASSE_TERAPEUTICA": rng.choice(CLASSES),
+            "EMPRESA_DETENTORA_REGISTRO": rng.choice(empresas),
+            "SITUACAO_REGISTRO": _weighted(rng, SITUACOES),
+            "PRINCIPIO_ATIVO": " + ".join(substancias),
+        }
+        for column, rate in NULL_RATES.items():
+            if rng.random() < rate:
+                row[column] = ""
+        yield row
+
+
+def write_csv(path: str, count: int, seed: int = 42) -> int:
+    """
+    Write an ANVISA-shaped CSV (same headers, `;` delimiter, ISO-8859-1) with `count`
+    rows, streaming. Returns the file size in bytes.
+    """
+    with open(path, "w", encoding="iso-8859-1", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_HEADERS, delimiter=";", lineterminator="\r\n")
+        writer.writeheader()
+        for row in generate_rows(count, seed):
+            writer.writerow(row)
+    return os.path.getsize(path)